@@ -1,11 +1,16 @@
 import os
 from flask import Flask
-from .extensions import db, migrate
+from .extensions import db, migrate, sock
 from .main import main as main_blueprint
 from .utils import init_app
+from .cache import init_cache
+from .suno_jobs import init_music_jobs
+from .transport import init_transport
+from .token_store import ensure_last_seen_column, start_token_refresher
+from .inference import start_detector_warmup
 from flask_cors import CORS
 
-def create_app(config_name='development'):
+def create_app(config_name='development', preload_models=None):
     base_dir = os.path.abspath(os.path.dirname(__file__))
     static_folder = os.path.join(base_dir, '..', 'public')
 
@@ -20,6 +25,9 @@ def create_app(config_name='development'):
     app.config['SPOTIFY_CLIENT_SECRET'] = os.environ.get('SPOTIFY_CLIENT_SECRET')
     app.config['SPOTIFY_REDIRECT_URI'] = os.environ.get('SPOTIFY_REDIRECT_URI')
 
+    init_transport(app)
+    init_cache(app)
+    init_music_jobs(app)
     app.config['GENRES_PATH'] = init_app(app=app)
 
     # Configure CORS to allow credentials and specify origins
@@ -37,8 +45,21 @@ def create_app(config_name='development'):
 
     db.init_app(app)
     migrate.init_app(app, db)
+    sock.init_app(app)
     app.register_blueprint(main_blueprint)
 
     with app.app_context():
         db.create_all()
+        # create_all() only creates missing tables; add columns introduced since
+        ensure_last_seen_column()
+
+    # Keep stored Spotify tokens ahead of expiry so requests never wait on the OAuth endpoint
+    if app.config.get('SPOTIFY_TOKEN_REFRESH_INTERVAL') and not app.testing:
+        start_token_refresher(app)
+
+    # Warm the emotion detector in the background so routes are served immediately
+    if preload_models is None:
+        preload_models = app.config.get('YOLO_PRELOAD', True)
+    if preload_models:
+        start_detector_warmup(app.config)
     return app
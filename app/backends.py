@@ -0,0 +1,241 @@
+import ast
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ClassificationProbs:
+    """Minimal stand-in for ultralytics' Probs (top1 / top1conf / data)."""
+
+    def __init__(self, data: np.ndarray, top1: int):
+        self.data = data
+        self.top1 = top1
+        self.top1conf = float(data[top1])
+
+
+class ClassificationResult:
+    """
+    Result of one image from a non-ultralytics backend.
+
+    Exposes the attributes YOLOEmotionDetector reads from ultralytics Results
+    (names, probs, boxes, plot), so both backends share the same post-processing.
+    """
+
+    boxes = None
+
+    def __init__(self, probs: np.ndarray, top1: int, names: Dict[int, str], orig_img: np.ndarray):
+        self.probs = ClassificationProbs(probs, top1)
+        self.names = names
+        self.orig_img = orig_img
+
+    def plot(self) -> np.ndarray:
+        annotated = self.orig_img.copy()
+        label = f"{self.names.get(self.probs.top1, self.probs.top1)} {self.probs.top1conf:.2f}"
+        scale = max(annotated.shape[1] / 640.0, 0.4)
+        cv2.putText(annotated, label, (8, int(28 * scale) + 4), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                    (255, 255, 255), max(1, int(2 * scale)), cv2.LINE_AA)
+        return annotated
+
+
+class UltralyticsBackend:
+    """Runs the model through the ultralytics YOLO wrapper."""
+
+    name = 'ultralytics'
+
+    def __init__(self, model_path: str):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path, task='classify')
+        self._batch_supported = True
+
+    def predict(self, images: List[np.ndarray]) -> List:
+        """
+        Exported ONNX models often have a fixed batch size of 1; if a batched call
+        fails once, later batches are run image by image.
+        """
+        if len(images) > 1 and self._batch_supported:
+            try:
+                return list(self.model(images, verbose=False))
+            except Exception as e:
+                logger.warning(f"Batched inference not supported, falling back to per-image: {e}")
+                self._batch_supported = False
+        return [self.model(image, verbose=False)[0] for image in images]
+
+
+class OnnxRuntimeBackend:
+    """
+    Runs an ultralytics-exported classification ONNX model directly with onnxruntime.
+
+    Preprocessing matches ultralytics' classify transforms (center square crop,
+    resize, scale to [0, 1]) and writes into a preallocated input tensor;
+    softmax/top-1 are computed for the whole batch at once.
+    """
+
+    name = 'onnxruntime'
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 max_batch_size: int = 8, input_size: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        self.static_batch = batch if isinstance(batch, int) else None
+        self.height = height if isinstance(height, int) else (input_size or 224)
+        self.width = width if isinstance(width, int) else (input_size or 224)
+        self.max_batch_size = self.static_batch or max(1, max_batch_size)
+        self.names = self._read_names()
+
+        # Preallocated input and output tensors, bound to the session with io_binding so
+        # onnxruntime writes into them instead of allocating per call. Guarded because
+        # predict may be called from several threads.
+        self._input = np.zeros((self.max_batch_size, 3, self.height, self.width), dtype=np.float32)
+        model_output = self.session.get_outputs()[0]
+        self.output_name = model_output.name
+        num_classes = model_output.shape[-1]
+        self._output = (
+            np.zeros((self.max_batch_size, num_classes), dtype=np.float32)
+            if isinstance(num_classes, int) and len(model_output.shape) == 2 else None
+        )
+        self._lock = threading.Lock()
+
+    def _read_names(self) -> Dict[int, str]:
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        try:
+            names = ast.literal_eval(metadata.get('names', '{}'))
+        except (ValueError, SyntaxError):
+            names = {}
+        if isinstance(names, list):
+            names = dict(enumerate(names))
+        return {int(k): v for k, v in names.items()}
+
+    def _fill(self, slot: int, image: np.ndarray) -> None:
+        """Center-crop, resize and scale one image into the preallocated input tensor."""
+        height, width = image.shape[:2]
+        side = min(height, width)
+        top, left = (height - side) // 2, (width - side) // 2
+        crop = image[top:top + side, left:left + side]
+        resized = cv2.resize(crop, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+        if resized.ndim == 2:
+            resized = resized[:, :, None]
+        # HWC BGR -> CHW RGB, scaled to [0, 1]
+        np.multiply(resized[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=self._input[slot], casting='unsafe')
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        # Exported classifiers normally end in softmax already; only normalise raw logits
+        sums = logits.sum(axis=1)
+        if np.all(logits >= 0) and np.allclose(sums, 1.0, atol=1e-3):
+            return logits
+        shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return shifted / shifted.sum(axis=1, keepdims=True)
+
+    def _run(self, rows: int) -> np.ndarray:
+        """Run the first rows of the input tensor; returns the model output for those rows."""
+        feed = self._input[:rows]
+        if self._output is None:
+            # Output shape unknown up front; let onnxruntime allocate it
+            return self.session.run([self.output_name], {self.input_name: feed})[0]
+        output = self._output[:rows]
+        binding = self.session.io_binding()
+        binding.bind_input(self.input_name, 'cpu', 0, np.float32, list(feed.shape), feed.ctypes.data)
+        binding.bind_output(self.output_name, 'cpu', 0, np.float32, list(output.shape), output.ctypes.data)
+        self.session.run_with_iobinding(binding)
+        return output
+
+    def predict(self, images: List[np.ndarray]) -> List[ClassificationResult]:
+        results = []
+        with self._lock:
+            for start in range(0, len(images), self.max_batch_size):
+                chunk = images[start:start + self.max_batch_size]
+                for slot, image in enumerate(chunk):
+                    self._fill(slot, image)
+                # A static-batch graph always gets its full batch; unused rows are ignored
+                rows = self.max_batch_size if self.static_batch else len(chunk)
+                # Copy out of the shared output buffer before the next chunk overwrites it
+                probs = self._softmax(self._run(rows)[:len(chunk)].copy())
+                top1 = probs.argmax(axis=1)
+                results.extend(
+                    ClassificationResult(probs[i], int(top1[i]), self.names, image)
+                    for i, image in enumerate(chunk)
+                )
+        return results
+
+
+# Registered model files (in app/). Quantized and reduced-resolution variants are
+# produced from the FP32 export with manage_models.py; export_size is the imgsz
+# used for that export, while the runtime input size is read from the model file.
+MODEL_VARIANTS = {
+    'fp32': {'file': 'best.onnx', 'export_size': 224},
+    'int8': {'file': 'best.int8.onnx', 'source': 'fp32'},
+    'fp32-160': {'file': 'best-160.onnx', 'export_size': 160},
+    'int8-160': {'file': 'best-160.int8.onnx', 'source': 'fp32-160'},
+}
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT_SIZE = 224
+
+
+def variant_path(name: str) -> str:
+    if name not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{name}' (expected one of {sorted(MODEL_VARIANTS)})")
+    return os.path.join(MODEL_DIR, MODEL_VARIANTS[name]['file'])
+
+
+def model_input_size(path: str) -> int:
+    """
+    Square input size of an ONNX model: the static height of its input, else the
+    imgsz ultralytics records in the metadata, else DEFAULT_INPUT_SIZE.
+    """
+    import onnx
+
+    model = onnx.load(path, load_external_data=False)
+    dims = model.graph.input[0].type.tensor_type.shape.dim
+    if len(dims) == 4 and dims[2].dim_value > 0:
+        return int(dims[2].dim_value)
+    metadata = {prop.key: prop.value for prop in model.metadata_props}
+    try:
+        imgsz = ast.literal_eval(metadata.get('imgsz', 'None'))
+    except (ValueError, SyntaxError):
+        imgsz = None
+    if isinstance(imgsz, (list, tuple)) and imgsz:
+        imgsz = imgsz[0]
+    return int(imgsz) if isinstance(imgsz, int) and imgsz > 0 else DEFAULT_INPUT_SIZE
+
+
+def resolve_model_variant(name: str):
+    """Return (model_path, input_size) for a registered variant, failing early if its file is missing."""
+    path = variant_path(name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Model variant '{name}' not found at {path}; build it with manage_models.py"
+        )
+    return path, model_input_size(path)
+
+
+BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+}
+
+
+def create_backend(name: str, model_path: str, **options):
+    """Instantiate an inference backend by name; options are passed to backends that accept them."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (expected one of {sorted(BACKENDS)})")
+    if name == UltralyticsBackend.name:
+        return UltralyticsBackend(model_path)
+    return BACKENDS[name](model_path, **options)
@@ -1,28 +1,421 @@
-from flask import current_app
-from cachetools import TTLCache
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import os
+import pickle
+import sqlite3
+import sys
 import threading
+import time
 
-# Thread-local storage for cache instances
-_local = threading.local()
+DEFAULT_NAMESPACE = 'default'
+DEFAULT_TTL = 300                      # 5 minutes
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024   # 64 MiB across all namespaces
+
+_MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteBackend:
+    """Cross-process cache tier stored in a local SQLite file.
+
+    Every worker process on the box opens the same file, so entries warmed by
+    one gunicorn worker are visible to the others.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                ' namespace TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' value BLOB NOT NULL,'
+                ' expires_at REAL,'
+                ' PRIMARY KEY (namespace, key))'
+            )
+
+    def _connect(self):
+        # Connections must not cross threads or survive a fork
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != pid:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def get(self, namespace, key):
+        """Return (payload, expires_at) or None if absent or expired."""
+        row = self._connect().execute(
+            'SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        payload, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return payload, expires_at
+
+    def get_many(self, namespace, keys, chunk_size=500):
+        """Return {key: (payload, expires_at)} for the unexpired keys, one IN (...) query per chunk."""
+        conn = self._connect()
+        now = time.time()
+        rows = {}
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            for key, payload, expires_at in conn.execute(
+                f'SELECT key, value, expires_at FROM cache_entries WHERE namespace = ? AND key IN ({placeholders})',
+                (namespace, *chunk)
+            ):
+                if expires_at is None or expires_at > now:
+                    rows[key] = (payload, expires_at)
+        return rows
+
+    def set(self, namespace, key, payload, expires_at):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+            (namespace, key, payload, expires_at)
+        )
+
+    def set_many(self, namespace, rows):
+        """Write (key, payload, expires_at) rows in one transaction, taking the write lock once."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                [(namespace, key, payload, expires_at) for key, payload, expires_at in rows]
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def delete(self, namespace, key):
+        self._connect().execute(
+            'DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (namespace, key)
+        )
+
+    def clear(self, namespace=None):
+        conn = self._connect()
+        if namespace is None:
+            conn.execute('DELETE FROM cache_entries')
+        else:
+            conn.execute('DELETE FROM cache_entries WHERE namespace = ?', (namespace,))
+
+    def purge_expired(self):
+        self._connect().execute(
+            'DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+        )
+
+
+class SharedCache:
+    """Process-wide, thread-safe cache with namespaces and byte-size-aware LRU eviction.
+
+    Each namespace can have its own TTL (None means entries never expire).
+    An optional backend (see SQLiteBackend) is written through on every set and
+    consulted on memory misses.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, default_ttl=DEFAULT_TTL, namespace_ttls=None, backend=None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.namespace_ttls = dict(namespace_ttls or {})
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (namespace, key) -> (value, size, expires_at)
+        self._bytes = 0
+        self._stats = {}
+
+    def _ttl_for(self, namespace, ttl=_MISSING):
+        if ttl is not _MISSING:
+            return ttl
+        return self.namespace_ttls.get(namespace, self.default_ttl)
+
+    def _ns_stats(self, namespace):
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = {
+                'hits': 0, 'misses': 0, 'backend_hits': 0,
+                'evictions': 0, 'expirations': 0, 'entries': 0, 'bytes': 0
+            }
+        return stats
+
+    @staticmethod
+    def _serialize(value):
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            return payload, len(payload)
+        except Exception:
+            return None, sys.getsizeof(value)
+
+    def _remove(self, full_key):
+        value, size, _ = self._entries.pop(full_key)
+        self._bytes -= size
+        stats = self._ns_stats(full_key[0])
+        stats['entries'] -= 1
+        stats['bytes'] -= size
+        return value
+
+    def _store(self, full_key, value, size, expires_at):
+        if full_key in self._entries:
+            self._remove(full_key)
+        if size > self.max_bytes:
+            return
+        while self._bytes + size > self.max_bytes and self._entries:
+            evicted_key = next(iter(self._entries))
+            self._remove(evicted_key)
+            self._ns_stats(evicted_key[0])['evictions'] += 1
+        self._entries[full_key] = (value, size, expires_at)
+        self._bytes += size
+        stats = self._ns_stats(full_key[0])
+        stats['entries'] += 1
+        stats['bytes'] += size
+
+    def _lookup(self, full_key, now):
+        """Return the cached value or _MISSING. Caller must hold the lock."""
+        entry = self._entries.get(full_key)
+        if entry is None:
+            return _MISSING
+        value, _, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            self._remove(full_key)
+            self._ns_stats(full_key[0])['expirations'] += 1
+            return _MISSING
+        self._entries.move_to_end(full_key)
+        return value
+
+    def _store_backend_rows(self, namespace, rows):
+        """Promote rows read from the backend into memory and count them as hits."""
+        values = {key: pickle.loads(payload) for key, (payload, _) in rows.items()}
+        with self._lock:
+            stats = self._ns_stats(namespace)
+            for key, (payload, expires_at) in rows.items():
+                self._store((namespace, key), values[key], len(payload), expires_at)
+            stats['misses'] -= len(rows)
+            stats['hits'] += len(rows)
+            stats['backend_hits'] += len(rows)
+        return values
+
+    def _load_from_backend(self, namespace, key):
+        if self.backend is None:
+            return _MISSING
+        try:
+            row = self.backend.get(namespace, key)
+        except sqlite3.Error:
+            return _MISSING
+        if row is None:
+            return _MISSING
+        return self._store_backend_rows(namespace, {key: row})[key]
+
+    def get(self, key, namespace=DEFAULT_NAMESPACE, default=None):
+        with self._lock:
+            value = self._lookup((namespace, key), time.time())
+            stats = self._ns_stats(namespace)
+            if value is not _MISSING:
+                stats['hits'] += 1
+                return value
+            stats['misses'] += 1
+        value = self._load_from_backend(namespace, key)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, namespace=DEFAULT_NAMESPACE):
+        """Return a dict with the subset of keys that are cached."""
+        found, missing = {}, []
+        now = time.time()
+        with self._lock:
+            stats = self._ns_stats(namespace)
+            for key in keys:
+                value = self._lookup((namespace, key), now)
+                if value is _MISSING:
+                    missing.append(key)
+                else:
+                    found[key] = value
+            stats['hits'] += len(found)
+            stats['misses'] += len(missing)
+        if missing and self.backend is not None:
+            try:
+                rows = self.backend.get_many(namespace, missing)
+            except sqlite3.Error:
+                rows = {}
+            if rows:
+                found.update(self._store_backend_rows(namespace, rows))
+        return found
+
+    def set(self, key, value, namespace=DEFAULT_NAMESPACE, ttl=_MISSING):
+        ttl = self._ttl_for(namespace, ttl)
+        expires_at = time.time() + ttl if ttl is not None else None
+        payload, size = self._serialize(value)
+        with self._lock:
+            self._store((namespace, key), value, size, expires_at)
+        if self.backend is not None and payload is not None:
+            try:
+                self.backend.set(namespace, key, payload, expires_at)
+            except sqlite3.Error:
+                pass
+
+    def set_many(self, items, namespace=DEFAULT_NAMESPACE, ttl=_MISSING):
+        ttl = self._ttl_for(namespace, ttl)
+        expires_at = time.time() + ttl if ttl is not None else None
+        serialized = [(key, value) + self._serialize(value) for key, value in items.items()]
+        with self._lock:
+            for key, value, _, size in serialized:
+                self._store((namespace, key), value, size, expires_at)
+        rows = [(key, payload, expires_at) for key, _, payload, _ in serialized if payload is not None]
+        if self.backend is not None and rows:
+            try:
+                self.backend.set_many(namespace, rows)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache backend set_many failed for namespace '{namespace}': {e}")
+
+    def delete(self, key, namespace=DEFAULT_NAMESPACE):
+        with self._lock:
+            if (namespace, key) in self._entries:
+                self._remove((namespace, key))
+        if self.backend is not None:
+            try:
+                self.backend.delete(namespace, key)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache backend delete failed for {namespace}/{key}: {e}")
+
+    def clear(self, namespace=None):
+        with self._lock:
+            for full_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                self._remove(full_key)
+        if self.backend is not None:
+            try:
+                self.backend.clear(namespace)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache backend clear failed for {namespace or 'all namespaces'}: {e}")
+
+    def stats(self):
+        with self._lock:
+            namespaces = {ns: dict(stats) for ns, stats in self._stats.items()}
+            return {
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'entries': len(self._entries),
+                'backend': type(self.backend).__name__ if self.backend else None,
+                'namespaces': namespaces
+            }
+
+
+# Process-wide cache instance shared by every request thread
+_cache = None
+_cache_lock = threading.Lock()
+
+def init_cache(app):
+    """Configure the process-wide cache from the Flask app config."""
+    global _cache
+    backend_path = app.config.get('CACHE_SQLITE_PATH')
+    backend = SQLiteBackend(backend_path) if backend_path else None
+    if backend is not None:
+        backend.purge_expired()
+    with _cache_lock:
+        _cache = SharedCache(
+            max_bytes=app.config.get('CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+            default_ttl=app.config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL),
+            namespace_ttls=app.config.get('CACHE_NAMESPACE_TTLS'),
+            backend=backend
+        )
+    return _cache
 
 def get_cache():
-    """Get or create a thread-local cache instance."""
-    if not hasattr(_local, 'cache'):
-        # Create a cache with 1000 max items and 300 seconds (5 minutes) TTL
-        _local.cache = TTLCache(maxsize=1000, ttl=300)
-    return _local.cache
+    """Get the process-wide cache instance, creating a default one if needed."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SharedCache()
+    return _cache
 
-def cache_get(key):
+def cache_get(key, namespace=DEFAULT_NAMESPACE):
     """Get a value from the cache."""
-    cache = get_cache()
-    return cache.get(key)
+    return get_cache().get(key, namespace=namespace)
+
+def cache_get_many(keys, namespace=DEFAULT_NAMESPACE):
+    """Get all cached values for the given keys."""
+    return get_cache().get_many(keys, namespace=namespace)
 
-def cache_set(key, value):
+def cache_set(key, value, namespace=DEFAULT_NAMESPACE, ttl=_MISSING):
     """Set a value in the cache."""
-    cache = get_cache()
-    cache[key] = value
+    get_cache().set(key, value, namespace=namespace, ttl=ttl)
+
+def cache_set_many(items, namespace=DEFAULT_NAMESPACE, ttl=_MISSING):
+    """Set several values in the cache."""
+    get_cache().set_many(items, namespace=namespace, ttl=ttl)
+
+def cache_delete(key, namespace=DEFAULT_NAMESPACE):
+    """Remove a single cached item."""
+    get_cache().delete(key, namespace=namespace)
+
+def cache_clear(namespace=None):
+    """Clear all cached items, or only those in one namespace."""
+    get_cache().clear(namespace)
+
+def cache_stats():
+    """Hit/miss/eviction counters and memory usage per namespace."""
+    return get_cache().stats()
+
+
+# Stale-while-revalidate loading with single-flight coalescing
+_inflight = {}
+_inflight_lock = threading.Lock()
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+
+def _load_once(key, loader, namespace, ttl):
+    """Run loader for (namespace, key) at most once at a time; concurrent callers share its result."""
+    full_key = (namespace, key)
+    with _inflight_lock:
+        future = _inflight.get(full_key)
+        owner = future is None
+        if owner:
+            future = _inflight[full_key] = Future()
+    if not owner:
+        return future.result()
+    try:
+        value = loader()
+        cache_set(key, (value, time.time()), namespace=namespace, ttl=ttl)
+        future.set_result(value)
+        return value
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(full_key, None)
+
+def _refresh(key, loader, namespace, ttl):
+    try:
+        _load_once(key, loader, namespace, ttl)
+    except Exception as e:
+        logger.warning(f"Background refresh failed for {namespace}:{key}: {e}")
+
+def cache_get_or_load(key, loader, namespace=DEFAULT_NAMESPACE, fresh_for=None, ttl=_MISSING):
+    """
+    Return the cached value for key, calling loader() to produce it if needed.
 
-def cache_clear():
-    """Clear all cached items."""
-    cache = get_cache()
-    cache.clear()
\ No newline at end of file
+    Entries younger than fresh_for seconds are returned as-is. Older entries
+    that are still cached (see the namespace TTL) are served immediately while
+    a background thread refreshes them. On a miss, concurrent callers for the
+    same key wait on a single loader call. None results are cached too.
+    """
+    entry = cache_get(key, namespace=namespace)
+    if entry is None:
+        return _load_once(key, loader, namespace, ttl)
+    value, loaded_at = entry
+    if fresh_for is not None and time.time() - loaded_at > fresh_for:
+        with _inflight_lock:
+            refreshing = (namespace, key) in _inflight
+        if not refreshing:
+            _refresh_executor.submit(_refresh, key, loader, namespace, ttl)
+    return value
@@ -22,6 +22,94 @@ class Config:
     MIN_PLAYLIST_TRACKS = 10
     MAX_PLAYLIST_TRACKS = 20
 
+    # Shared cache configuration (process-wide, optionally shared across workers via SQLite)
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    CACHE_DEFAULT_TTL = 300
+    CACHE_NAMESPACE_TTLS = {
+        'genres': None,          # GENRES.md never changes at runtime
+        'audio_features': 300,
+        'genre_search': 24 * 3600,  # served stale after an hour, see utils.SEARCH_CACHE_FRESH_SECONDS
+        'suno_results': 7 * 24 * 3600,  # completed generations per (prompt, model, instrumental)
+        'suno_audio': 7 * 24 * 3600  # Suno task id -> remote audio URL
+    }
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH')  # e.g. instance/cache.db
+
+    # Durable audio-features store (features for a track id practically never change)
+    AUDIO_FEATURES_TTL = int(os.environ.get('AUDIO_FEATURES_TTL', 90 * 24 * 3600))  # 0 disables expiry
+
+    # reccobeats fetching: bounded concurrency, retries with jittered backoff, overall per-call deadline
+    RECCOBEATS_MAX_WORKERS = int(os.environ.get('RECCOBEATS_MAX_WORKERS', 8))
+    RECCOBEATS_MAX_RETRIES = 3
+    RECCOBEATS_DEADLINE = float(os.environ.get('RECCOBEATS_DEADLINE', 15))  # seconds
+
+    # Shared outbound HTTP transport (app/transport.py): pooled keep-alive sessions per service
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 32))  # connections kept per host
+    HTTP_CONNECT_TIMEOUT = 3.05  # seconds
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))  # seconds
+    HTTP_MAX_RETRIES = 2  # idempotent requests only, on connection errors and 429/5xx
+    HTTP_BACKOFF_FACTOR = 0.3
+    HTTP_MAX_RETRY_AFTER = 5.0  # cap on Retry-After sleeps so a 429 can't park a request thread
+
+    # Concurrent Spotify genre fan-out in get_selected_tracks
+    SPOTIFY_MAX_WORKERS = int(os.environ.get('SPOTIFY_MAX_WORKERS', 8))
+    # Spotify clients cached per access token, and how long each memoizes the user's profile
+    SPOTIFY_CLIENT_CACHE_SIZE = 256
+    SPOTIFY_PROFILE_TTL = 300  # seconds
+    # Background refresh of tokens stored on User rows (0 disables the refresher thread)
+    SPOTIFY_TOKEN_REFRESH_INTERVAL = int(os.environ.get('SPOTIFY_TOKEN_REFRESH_INTERVAL', 60))  # seconds
+    SPOTIFY_TOKEN_REFRESH_AHEAD = 1440  # refresh tokens with less than this many seconds left
+    SPOTIFY_TOKEN_ACTIVE_WINDOW = 86400  # only users seen within this many seconds are refreshed ahead
+
+    # Background Suno generation jobs (/api/generate-music)
+    SUNO_MAX_WAIT = 300  # seconds before a job times out
+    SUNO_MAX_WORKERS = int(os.environ.get('SUNO_MAX_WORKERS', 4))  # submission / poll requests
+    # Per-status (first, max) poll intervals in seconds; None uses app.suno_jobs.DEFAULT_POLL_BACKOFF
+    SUNO_POLL_BACKOFF = None
+    # Local copies of generated audio, relative to the instance folder (empty disables)
+    SUNO_AUDIO_CACHE_DIR = os.environ.get('SUNO_AUDIO_CACHE_DIR', 'suno_audio')
+    SUNO_AUDIO_CACHE_MAX_BYTES = int(os.environ.get('SUNO_AUDIO_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+    SUNO_AUDIO_DOWNLOAD_WORKERS = 2  # background audio downloads, separate from SUNO_MAX_WORKERS
+    SUNO_JOB_TTL = 3600  # seconds finished jobs stay available
+    SUNO_EVENTS_KEEPALIVE = 15  # seconds between SSE keepalive comments
+
+    # Per-emotion score weight overrides, e.g. {'Joy': {'valence': 0.5, 'energy': 0.3}}.
+    # Emotions not listed fall back to the profiles in app/scoring.py.
+    EMOTION_WEIGHT_PROFILES = {}
+
+    # Local nearest-neighbour track index: a genre is served locally once it has enough tracks
+    TRACK_INDEX_MIN_TRACKS = int(os.environ.get('TRACK_INDEX_MIN_TRACKS', 50))
+    TRACK_INDEX_OVERSAMPLE = 3           # sample k tracks out of the k * 3 nearest
+    TRACK_INDEX_RELOAD_SECONDS = 600     # pick up tracks indexed by other workers
+
+    # YOLO emotion detection: micro-batch concurrent frames into one inference call
+    YOLO_BATCH_WINDOW_MS = float(os.environ.get('YOLO_BATCH_WINDOW_MS', 5))
+    YOLO_MAX_BATCH_SIZE = int(os.environ.get('YOLO_MAX_BATCH_SIZE', 8))
+    YOLO_WORKERS = int(os.environ.get('YOLO_WORKERS', min(2, os.cpu_count() or 1)))  # model instances
+    # Annotated previews cost about as much as inference; clients opt in with {"annotate": true}
+    YOLO_ANNOTATE_DEFAULT = os.environ.get('YOLO_ANNOTATE_DEFAULT', 'False').lower() in ('true', '1', 't')
+    YOLO_PREVIEW_MAX_SIDE = int(os.environ.get('YOLO_PREVIEW_MAX_SIDE', 480))
+    YOLO_PREVIEW_JPEG_QUALITY = int(os.environ.get('YOLO_PREVIEW_JPEG_QUALITY', 70))
+    # Crop frames to the face (OpenCV Haar cascade) and resize to the model input size.
+    # Off by default: only enable it for models trained on face crops.
+    YOLO_FACE_CROP = os.environ.get('YOLO_FACE_CROP', 'False').lower() in ('true', '1', 't')
+    # Model variant from app.backends.MODEL_VARIANTS: 'fp32', 'int8', 'fp32-160', 'int8-160'
+    YOLO_MODEL_VARIANT = os.environ.get('YOLO_MODEL_VARIANT', 'fp32')
+    # Inference engine: 'ultralytics' (YOLO wrapper) or 'onnxruntime' (runs the ONNX file directly)
+    YOLO_BACKEND = os.environ.get('YOLO_BACKEND', 'ultralytics')
+    ORT_INTRA_OP_THREADS = int(os.environ.get('ORT_INTRA_OP_THREADS', 0))  # 0 = cores / YOLO_WORKERS
+    ORT_INTER_OP_THREADS = int(os.environ.get('ORT_INTER_OP_THREADS', 1))
+    # Perceptual-hash cache: frames within N bits of a recent frame reuse its result (size 0 disables)
+    YOLO_RESULT_CACHE_SIZE = int(os.environ.get('YOLO_RESULT_CACHE_SIZE', 256))
+    YOLO_RESULT_CACHE_DISTANCE = int(os.environ.get('YOLO_RESULT_CACHE_DISTANCE', 4))
+    YOLO_RESULT_CACHE_TTL = float(os.environ.get('YOLO_RESULT_CACHE_TTL', 1.0))  # seconds
+    # Load the detector on a background thread at startup; otherwise on the first detection request
+    YOLO_PRELOAD = os.environ.get('YOLO_PRELOAD', 'True').lower() in ('true', '1', 't')
+    YOLO_LOAD_TIMEOUT = 30  # seconds a detection request waits for the model before returning 503
+
+    # WebSocket emotion stream: smoothed verdicts pushed at a fixed rate
+    EMOTION_STREAM_RATE_HZ = float(os.environ.get('EMOTION_STREAM_RATE_HZ', 4))
+    EMOTION_STREAM_HALF_LIFE = 1.5  # seconds
+
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=1)  # Set session lifetime to 1 hour
     SESSION_PERMANENT = True                         # Enable permanent sessions
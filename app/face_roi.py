@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+import threading
+from typing import Optional, Tuple
+
+Box = Tuple[int, int, int, int]  # x, y, w, h in full-frame pixels
+
+_local = threading.local()
+
+
+def _cascade():
+    """Per-thread Haar cascade; CascadeClassifier instances are not safe to share across threads."""
+    cascade = getattr(_local, 'cascade', None)
+    if cascade is None:
+        cascade = _local.cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'  # type: ignore
+        )
+    return cascade
+
+
+def detect_face(gray: np.ndarray, detect_width: int = 320, min_face: int = 32,
+                offset: Tuple[int, int] = (0, 0)) -> Optional[Box]:
+    """
+    Find the largest face in a grayscale image.
+
+    Detection runs on a copy downscaled to detect_width, which is what keeps the
+    Haar cascade cheap; the returned box is in the input image's pixels plus offset.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, detect_width / float(width))
+    small = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    faces = _cascade().detectMultiScale(
+        small, scaleFactor=1.1, minNeighbors=5, minSize=(max(1, int(min_face * scale)),) * 2
+    )
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    return (int(x / scale) + offset[0], int(y / scale) + offset[1], int(w / scale), int(h / scale))
+
+
+def square_box(box: Box, margin: float) -> Box:
+    """Grow a box by margin on every side into a square around its centre; may extend past the frame."""
+    x, y, w, h = box
+    side = int(max(w, h) * (1.0 + 2.0 * margin))
+    return (x + w // 2 - side // 2, y + h // 2 - side // 2, side, side)
+
+
+def expand_box(box: Box, frame_shape, margin: float) -> Box:
+    """square_box clipped to the frame (used as a search window, so it need not stay square)."""
+    x, y, side, _ = square_box(box, margin)
+    height, width = frame_shape[:2]
+    x0 = max(0, min(x, width - 1))
+    y0 = max(0, min(y, height - 1))
+    return (x0, y0, max(1, min(x + side, width) - x0), max(1, min(y + side, height) - y0))
+
+
+def crop_face(gray: np.ndarray, box: Box, output_size: int, margin: float = 0.25) -> np.ndarray:
+    """
+    Crop the face (with margin) and resize it to the model input size.
+
+    Faces near the frame edge are padded by replicating the border rather than
+    clipped, so the crop stays square and the face is not stretched on resize.
+    """
+    x, y, side, _ = square_box(box, margin)
+    height, width = gray.shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + side), min(height, y + side)
+    face = gray[y0:y1, x0:x1]
+    if (x1 - x0, y1 - y0) != (side, side):
+        face = cv2.copyMakeBorder(
+            face, y0 - y, y + side - y1, x0 - x, x + side - x1, cv2.BORDER_REPLICATE
+        )
+    return cv2.resize(face, (output_size, output_size), interpolation=cv2.INTER_AREA)
+
+
+class FaceTracker:
+    """
+    Reuses the face ROI across consecutive frames of one stream.
+
+    The cascade only runs every redetect_every frames, and then first inside a
+    window around the previous box. A lost face is kept for max_misses failed
+    re-detections before falling back to the full frame.
+    """
+
+    def __init__(self, redetect_every: int = 5, max_misses: int = 3, search_margin: float = 0.75):
+        self.redetect_every = redetect_every
+        self.max_misses = max_misses
+        self.search_margin = search_margin
+        self.box: Optional[Box] = None
+        self._since_detect = 0
+        self._misses = 0
+
+    def locate(self, gray: np.ndarray) -> Optional[Box]:
+        if self.box is not None and self._since_detect < self.redetect_every:
+            self._since_detect += 1
+            return self.box
+
+        box = None
+        if self.box is not None:
+            # Search near the previous ROI before scanning the whole frame
+            x, y, w, h = expand_box(self.box, gray.shape, self.search_margin)
+            box = detect_face(gray[y:y + h, x:x + w], offset=(x, y))
+        if box is None:
+            box = detect_face(gray)
+
+        self._since_detect = 0
+        if box is not None:
+            self.box = box
+            self._misses = 0
+        elif self.box is not None:
+            self._misses += 1
+            if self._misses > self.max_misses:
+                self.box = None
+        return self.box
@@ -0,0 +1,122 @@
+from flask import current_app
+from .extensions import db
+from .models import AudioFeature
+import json
+import time
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+QUERY_CHUNK_SIZE = 500
+
+
+def chunks(items, size=QUERY_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _min_fetched_at():
+    ttl = current_app.config.get('AUDIO_FEATURES_TTL')
+    return int(time.time()) - ttl if ttl else None
+
+
+def load_features(track_ids):
+    """
+    Look up stored audio features for many track IDs at once.
+
+    Returns a dict of track_id -> features for every ID that is stored and
+    younger than AUDIO_FEATURES_TTL.
+    """
+    track_ids = list(dict.fromkeys(track_ids))
+    if not track_ids:
+        return {}
+    min_fetched_at = _min_fetched_at()
+    found = {}
+    for chunk in chunks(track_ids):
+        query = AudioFeature.query.filter(AudioFeature.track_id.in_(chunk))
+        if min_fetched_at is not None:
+            query = query.filter(AudioFeature.fetched_at >= min_fetched_at)
+        for row in query:
+            found[row.track_id] = row.features
+    return found
+
+
+def save_features(features_by_id, fetched_at=None):
+    """
+    Insert or refresh stored audio features.
+
+    Empty feature dicts (failed lookups) are never persisted.
+    """
+    features_by_id = {tid: f for tid, f in features_by_id.items() if tid and f}
+    if not features_by_id:
+        return 0
+    fetched_at = fetched_at or int(time.time())
+    rows = [
+        {'track_id': tid, 'features': features, 'fetched_at': fetched_at}
+        for tid, features in features_by_id.items()
+    ]
+    insert = upsert_insert()
+    for chunk in chunks(rows):
+        if insert is None:
+            for row in chunk:
+                db.session.merge(AudioFeature(row['track_id'], row['features'], row['fetched_at']))
+            continue
+        # Upsert, so workers saving the same tracks concurrently never hit a duplicate key
+        statement = insert(AudioFeature).values(chunk)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[AudioFeature.track_id],
+            set_={'features': statement.excluded.features, 'fetched_at': statement.excluded.fetched_at}
+        ))
+    db.session.commit()
+    return len(rows)
+
+
+def upsert_insert():
+    """Dialect insert() supporting ON CONFLICT DO UPDATE, or None to fall back to merge()."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def export_features(path):
+    """Write every stored feature row to a JSON-lines file. Returns the row count."""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        for row in AudioFeature.query.order_by(AudioFeature.track_id).yield_per(QUERY_CHUNK_SIZE):
+            file.write(json.dumps({
+                'id': row.track_id,
+                'fetched_at': row.fetched_at,
+                'features': row.features
+            }) + '\n')
+            count += 1
+    return count
+
+
+def import_features(path):
+    """
+    Pre-seed the store from a JSON-lines file.
+
+    Accepts lines written by export_features as well as raw reccobeats
+    feature objects (which carry their own 'id').
+    """
+    batch = {}
+    count = 0
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            features = record.get('features', record)
+            track_id = record.get('id') or features.get('id')
+            if not track_id:
+                continue
+            batch[track_id] = features
+            if len(batch) >= QUERY_CHUNK_SIZE:
+                count += save_features(batch)
+                batch = {}
+    count += save_features(batch)
+    return count
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def dhash(gray: np.ndarray) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 thumbnail."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hash_image_bytes(image_bytes) -> Optional[int]:
+    """Hash encoded image bytes from a 1/8-scale grayscale decode (JPEG decodes at reduced scale directly)."""
+    small = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if small is None:
+        return None
+    return dhash(small)
+
+
+class FrameResultCache:
+    """
+    LRU cache of detection results keyed by client scope and perceptual hash.
+
+    A lookup hits when a stored hash from the same scope (one stream or user)
+    is within max_distance bits (Hamming) of the frame's hash and the entry is
+    younger than ttl seconds, so the near-identical frames an idle webcam sends
+    reuse the last verdict. Scoping keeps clients from sharing verdicts for
+    frames that merely hash alike, such as all-black ones.
+    """
+
+    def __init__(self, max_entries: int = 256, max_distance: int = 4, ttl: float = 1.0):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Tuple[Hashable, int], tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope: Hashable, frame_hash: int) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            match = None
+            for key, (result, stored_at) in reversed(self._entries.items()):
+                if key[0] != scope or now - stored_at > self.ttl:
+                    continue
+                if bin(key[1] ^ frame_hash).count('1') <= self.max_distance:
+                    match = key
+                    break
+            if match is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(match)
+            self.hits += 1
+            return dict(self._entries[match][0])
+
+    def set(self, scope: Hashable, frame_hash: int, result: Dict) -> None:
+        key = (scope, frame_hash)
+        with self._lock:
+            self._entries[key] = (dict(result), time.monotonic())
+            self._entries.move_to_end(key)
+            # Drop expired entries first, then the least recently used
+            now = time.monotonic()
+            for stale in [k for k, (_, stored_at) in self._entries.items() if now - stored_at > self.ttl]:
+                del self._entries[stale]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,273 @@
+from concurrent.futures import Future
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of a batch predict function.
+
+    Frames submitted concurrently are collected for up to window_ms (or until
+    max_batch_size frames are waiting), run through one predict(images) call,
+    and each caller's Future receives its own result.
+    """
+
+    def __init__(self, predict, window_ms=5.0, max_batch_size=8, name='yolo-batcher'):
+        self.predict = predict
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue = queue.Queue()
+        self._closed = False
+        self.batches = 0
+        self.frames = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, image):
+        """Queue one preprocessed image; returns a Future for its result."""
+        if self._closed:
+            raise RuntimeError('MicroBatcher is closed')
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = self._collect(item)
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.predict([image for image, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Batched inference failed for {len(batch)} frames: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.frames += len(batch)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'avg_batch_size': self.frames / self.batches if self.batches else 0.0,
+            'pending': self.pending()
+        }
+
+    def close(self, timeout=None):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            # Fail anything that was queued behind the stop marker
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    item[1].set_exception(RuntimeError('MicroBatcher is closed'))
+
+
+class DetectorPool:
+    """
+    Pool of independent detector instances (each with its own model and batcher).
+
+    Calls are dispatched to the worker with the fewest requests in flight, so
+    inference on different model objects proceeds in parallel.
+    """
+
+    def __init__(self, factory, size=1, warmup=True):
+        self.workers = [factory() for _ in range(max(1, size))]
+        self._inflight = [0] * len(self.workers)
+        self._served = [0] * len(self.workers)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._closed = False
+        if warmup:
+            for worker in self.workers:
+                worker.warmup()
+
+    def _acquire(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('DetectorPool is shut down')
+            # Least-loaded, with a rotating start so ties spread across workers
+            n = len(self.workers)
+            order = [(self._next + i) % n for i in range(n)]
+            index = min(order, key=lambda i: self._inflight[i])
+            self._next = (index + 1) % n
+            self._inflight[index] += 1
+            return index
+
+    def _release(self, index):
+        with self._lock:
+            self._inflight[index] -= 1
+            self._served[index] += 1
+
+    def _dispatch(self, method, *args, **kwargs):
+        index = self._acquire()
+        try:
+            return getattr(self.workers[index], method)(*args, **kwargs)
+        finally:
+            self._release(index)
+
+    def detect_emotion_from_frame(self, *args, **kwargs):
+        return self._dispatch('detect_emotion_from_frame', *args, **kwargs)
+
+    def detect_emotion_from_base64(self, *args, **kwargs):
+        return self._dispatch('detect_emotion_from_base64', *args, **kwargs)
+
+    def detect_emotion_from_bytes(self, *args, **kwargs):
+        return self._dispatch('detect_emotion_from_bytes', *args, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            workers = [
+                {'inflight': self._inflight[i], 'served': self._served[i]}
+                for i in range(len(self.workers))
+            ]
+        for worker, worker_stats in zip(self.workers, workers):
+            batcher = getattr(worker, 'batcher', None)
+            worker_stats['batching'] = batcher.stats() if batcher else None
+        result_cache = getattr(self.workers[0], 'result_cache', None)
+        return {
+            'size': len(self.workers),
+            'workers': workers,
+            'result_cache': result_cache.stats() if result_cache else None
+        }
+
+    def shutdown(self, timeout=5.0):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self.workers:
+            batcher = getattr(worker, 'batcher', None)
+            if batcher is not None:
+                batcher.close(timeout)
+
+
+# Process-wide detector pool, built lazily (or by a background warm-up thread)
+# so importing the app never pays for cv2/ultralytics or loading the model.
+_detector = None
+_detector_error = None
+_detector_loading = False
+_detector_ready = threading.Event()
+_detector_lock = threading.Lock()
+
+def build_detector_pool(config):
+    """Create the detector pool described by a Flask config mapping."""
+    from .backends import resolve_model_variant
+    from .frame_cache import FrameResultCache
+    from .yolo_detector import YOLOEmotionDetector
+
+    model_path, input_size = resolve_model_variant(config.get('YOLO_MODEL_VARIANT', 'fp32'))
+    workers = config.get('YOLO_WORKERS', 1)
+    # One result cache shared by all workers, since consecutive frames land on different workers;
+    # entries are scoped per client by the caller
+    result_cache = None
+    if config.get('YOLO_RESULT_CACHE_SIZE', 0) > 0:
+        result_cache = FrameResultCache(
+            max_entries=config['YOLO_RESULT_CACHE_SIZE'],
+            max_distance=config.get('YOLO_RESULT_CACHE_DISTANCE', 4),
+            ttl=config.get('YOLO_RESULT_CACHE_TTL', 1.0)
+        )
+    # Split the cores between model instances instead of letting each one claim them all
+    intra_op_threads = config.get('ORT_INTRA_OP_THREADS') or max(1, (os.cpu_count() or 1) // max(1, workers))
+    pool = DetectorPool(
+        lambda: YOLOEmotionDetector(
+            model_path=model_path,
+            batch_window_ms=config.get('YOLO_BATCH_WINDOW_MS', 5),
+            max_batch_size=config.get('YOLO_MAX_BATCH_SIZE', 8),
+            annotate=config.get('YOLO_ANNOTATE_DEFAULT', False),
+            preview_max_side=config.get('YOLO_PREVIEW_MAX_SIDE'),
+            jpeg_quality=config.get('YOLO_PREVIEW_JPEG_QUALITY', 70),
+            face_crop=config.get('YOLO_FACE_CROP', False),
+            input_size=input_size,
+            backend=config.get('YOLO_BACKEND', 'ultralytics'),
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=config.get('ORT_INTER_OP_THREADS', 1),
+            result_cache=result_cache
+        ),
+        size=workers
+    )
+    atexit.register(pool.shutdown)
+    return pool
+
+def _load_detector(config):
+    global _detector, _detector_error, _detector_loading
+    try:
+        started = time.monotonic()
+        _detector = build_detector_pool(config)
+        logger.info(f"Emotion detector ready in {time.monotonic() - started:.1f}s")
+    except Exception as e:
+        _detector_error = str(e)
+        logger.error(f"Failed to load emotion detector: {e}")
+    finally:
+        _detector_loading = False
+        _detector_ready.set()
+
+def start_detector_warmup(config, background=True):
+    """Begin loading the detector pool once per process; returns immediately when background."""
+    global _detector_loading
+    with _detector_lock:
+        if _detector_loading or _detector_ready.is_set():
+            return
+        _detector_loading = True
+    config = dict(config)
+    if background:
+        threading.Thread(target=_load_detector, args=(config,), name='yolo-warmup', daemon=True).start()
+    else:
+        _load_detector(config)
+
+def get_detector(config, timeout=None):
+    """
+    Return the detector pool, starting a load on first use if warm-up wasn't enabled.
+    Returns None if it isn't ready within timeout seconds or failed to load.
+    """
+    if not _detector_ready.is_set():
+        start_detector_warmup(config)
+        _detector_ready.wait(timeout)
+    return _detector
+
+def detector_status():
+    return {
+        'ready': _detector is not None,
+        'loading': _detector_loading,
+        'error': _detector_error,
+        'pool': _detector.stats() if _detector is not None else None
+    }
@@ -1,16 +1,25 @@
-from flask import Blueprint, request, jsonify, current_app, redirect, session, url_for, render_template, send_from_directory
-from .utils import get_selected_tracks, get_top_recommended_tracks, create_spotify_playlist, get_embedded_playlist_code, get_embedded_track_code, get_spotify_client
+from flask import Blueprint, Response, request, jsonify, current_app, redirect, session, url_for, render_template, send_from_directory, send_file, stream_with_context
+from .utils import get_selected_tracks, get_top_recommended_tracks, rank_top_tracks, create_spotify_playlist, get_embedded_playlist_code, get_embedded_track_code, get_spotify_client
 from .models import User, UserGenre
-from .yolo_detector import YOLOEmotionDetector
-from spotipy.oauth2 import SpotifyOAuth
+from .inference import get_detector, detector_status
 from flask_cors import CORS
-from .extensions import db
+from .extensions import db, sock
+from .streaming import EmotionStream
+from .cache import cache_stats
+from .suno_jobs import get_music_jobs, DEFAULT_MODEL
+from .transport import transport_stats
+from .token_store import get_oauth, get_access_token, save_tokens, clear_tokens, import_session_tokens, token_refresher_stats
+import base64
+import binascii
+import json
 import time
 import os
+import uuid
 from dotenv import load_dotenv
 import logging
 
 PERMISSION_ERROR = "Spotify client not authenticated"
+MAX_LOGGED_BODY_BYTES = 2048
 
 load_dotenv()
 main = Blueprint('main', __name__)
@@ -24,16 +33,40 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize YOLO emotion detector
-yolo_detector = YOLOEmotionDetector()
+DETECTOR_LOADING_ERROR = "Emotion detector is still loading, please retry shortly"
+
+def _get_detector():
+    # The YOLO detector pool is loaded lazily / by the warm-up thread started in create_app
+    return get_detector(current_app.config, timeout=current_app.config.get('YOLO_LOAD_TIMEOUT', 30))
 
 #* DEBUGGING
 @main.before_request
 def log_request_info():
     current_app.logger.info(f"Flask received request: {request.method} {request.url}")
     current_app.logger.info(f"Request headers: {dict(request.headers)}")
-    if request.is_json:
-        current_app.logger.info(f"Request body: {request.get_json()}")
+    # Only log small JSON bodies; image uploads would be parsed and dumped to the log otherwise
+    if request.is_json and (request.content_length or 0) <= MAX_LOGGED_BODY_BYTES:
+        current_app.logger.info(f"Request body: {request.get_json(silent=True)}")
+    elif request.content_length:
+        current_app.logger.info(f"Request body: {request.content_length} bytes ({request.mimetype})")
+
+# Probes must answer without touching the session or the database
+PROBE_ENDPOINTS = ('main.healthz', 'main.readyz')
+
+@main.before_request
+def migrate_session_tokens():
+    # Sessions issued before tokens moved server-side still carry token_info; move it to the user's row once
+    if request.endpoint in PROBE_ENDPOINTS or current_app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+        return
+    if 'token_info' not in session:
+        return
+    token_info = session.pop('token_info')
+    if token_info and session.get('user_id'):
+        try:
+            import_session_tokens(session['user_id'], token_info)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to migrate session tokens: {e}")
 
 @main.route('/debug-env')
 def debug_env():
@@ -42,16 +75,30 @@ def debug_env():
         'OTHER_VARIABLE': current_app.config.get('OTHER_VARIABLE')
     })
 
+#* Liveness and readiness probes
+@main.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'}), 200
+
+@main.route('/readyz')
+def readyz():
+    status = detector_status()
+    return jsonify({'ready': status['ready'], 'detector': status}), 200 if status['ready'] else 503
+
+@main.route('/debug-metrics')
+def debug_metrics():
+    return jsonify({
+        'cache': cache_stats(),
+        'yolo': detector_status(),
+        'suno': get_music_jobs().stats(),
+        'http': transport_stats(),
+        'spotify_tokens': token_refresher_stats()
+    })
+
 #* Login, Authentication, Get Token, Signout
 @main.route('/callback')
 def callback():
-    # Initialize Spotify OAuth
-    sp_oauth = SpotifyOAuth(
-        client_id=current_app.config['SPOTIFY_CLIENT_ID'],
-        client_secret=current_app.config['SPOTIFY_CLIENT_SECRET'],
-        redirect_uri=current_app.config['SPOTIFY_REDIRECT_URI'],
-        scope=current_app.config['SPOTIFY_SCOPES'],
-    )
+    sp_oauth = get_oauth(current_app.config)
     
     # Retrieve authorization code from the request
     code = request.args.get('code')
@@ -59,8 +106,7 @@ def callback():
         return jsonify({'error': 'Authorization code not found'}), 400
     try:
         token_info = sp_oauth.get_access_token(code, check_cache=False)
-        session['token_info'] = token_info
-        current_app.logger.info("Token retrieved and stored in session.")
+        current_app.logger.info("Token retrieved.")
     except Exception as e:
         current_app.logger.error(f"Failed to retrieve access token: {e}")
         return jsonify({'error': f'Failed to retrieve access token: {str(e)}'}), 500
@@ -87,55 +133,36 @@ def callback():
         new_user = User(user_id=user_id, display_name=display_name)
         db.session.add(new_user)
         db.session.commit()
+    # Tokens are kept server-side and refreshed in the background (app/token_store.py)
+    save_tokens(user_id, token_info)
     
     # Redirect back to Next.js app with a success parameter
     nextjs_url = os.environ.get('NEXTJS_FRONTEND_URL', 'http://localhost:3000')
     return redirect(f'{nextjs_url}/?auth=success')
 
 def check_auth():
-    if 'token_info' not in session:
+    if 'user_id' not in session:
         return redirect(url_for('main.login'))
     return None
 
 def get_token():
-    token_info = session.get('token_info')
-    if not token_info:
-        return None
-    now = int(time.time())
-    is_expired = token_info['expires_at'] - now < 1440
-    
-    if is_expired:
-        sp_oauth = SpotifyOAuth(
-            client_id=current_app.config['SPOTIFY_CLIENT_ID'],
-            client_secret=current_app.config['SPOTIFY_CLIENT_SECRET'],
-            redirect_uri=current_app.config['SPOTIFY_REDIRECT_URI'],
-            scope=current_app.config['SPOTIFY_SCOPES'],
-            cache_handler=None
-        )
-        token_info = sp_oauth.refresh_access_token(token_info['refresh_token'])
-        session['token_info'] = token_info
-    return token_info['access_token']
+    return get_access_token(session.get('user_id'), current_app.config)
 
 @main.route('/login')
 def login():
-    sp_oauth = SpotifyOAuth(
-        client_id=current_app.config['SPOTIFY_CLIENT_ID'],
-        client_secret=current_app.config['SPOTIFY_CLIENT_SECRET'],
-        redirect_uri=current_app.config['SPOTIFY_REDIRECT_URI'],
-        scope=current_app.config['SPOTIFY_SCOPES'],
-        cache_handler=None
-    )
-    auth_url = sp_oauth.get_authorize_url()
+    auth_url = get_oauth(current_app.config).get_authorize_url()
     return redirect(auth_url)
 
 @main.route('/signout', methods=['POST'])
 def signout():
+    if session.get('user_id'):
+        clear_tokens(session['user_id'])
     session.clear()
     return jsonify({'success': True}), 200
 
 @main.route('/api/auth-status')
 def auth_status():
-    if 'token_info' in session:
+    if 'user_id' in session:
         return jsonify({
             'isAuthenticated': True,
             'user': {
@@ -215,12 +242,12 @@ def create_playlist():
         current_app.logger.info(f'Received emotion: {emotion}')
 
         # Get random tracks based on emotion
-        tracks = get_selected_tracks(emotion)
+        tracks = get_selected_tracks(emotion, sp=sp)
         if not tracks:
             return jsonify({'error': f'No tracks found for emotion: {emotion}'}), 404
 
         # Create Spotify playlist
-        spotify_playlist_id = create_spotify_playlist(emotion, tracks)
+        spotify_playlist_id = create_spotify_playlist(emotion, tracks, sp=sp)
         if not spotify_playlist_id:
             return jsonify({'error': 'Failed to create Spotify playlist'}), 500
         
@@ -228,10 +255,8 @@ def create_playlist():
         embedded_playlist_code = get_embedded_playlist_code(spotify_playlist_id)
         current_app.logger.info(f"Embedded playlist code: {embedded_playlist_code}")
         
-        # Get top recommended tracks
-        top_tracks = get_top_recommended_tracks(emotion, spotify_playlist_id)
-        if not top_tracks:
-            top_tracks = []
+        # Top recommended tracks come straight from the tracks already scored above
+        top_tracks = rank_top_tracks(emotion, tracks)
         top_tracks_embedded = [get_embedded_track_code(track.spotify_id) for track in top_tracks]
 
         return jsonify({
@@ -304,24 +329,94 @@ def update_genres():
     return jsonify({"success": True}), 200
 
 #* YOLO Emotion Detection
+def _parse_flag(value):
+    if isinstance(value, str):
+        return value.lower() in ('true', '1', 't', 'yes')
+    return bool(value)
+
+# Bounds for the client-requested preview size (longest side, px)
+PREVIEW_MIN_SIDE = 32
+PREVIEW_MAX_SIDE = 1920
+
+def _int_option(source, name, low, high):
+    """Integer option clamped to [low, high]; raises ValueError on non-numeric input."""
+    try:
+        value = int(source[name])
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an integer")
+    return max(low, min(high, value))
+
+def _detection_options(source):
+    """Annotation options from a JSON body, query string or multipart form."""
+    options = {}
+    if 'annotate' in source:
+        options['annotate'] = _parse_flag(source.get('annotate'))
+    if source.get('preview_max_side'):
+        options['preview_max_side'] = _int_option(source, 'preview_max_side', PREVIEW_MIN_SIDE, PREVIEW_MAX_SIDE)
+    if source.get('preview_quality'):
+        options['jpeg_quality'] = _int_option(source, 'preview_quality', 1, 100)
+    return options
+
 @main.route('/api/detect-emotion', methods=['POST'])
 def detect_emotion():
     """
-    Detect emotion using YOLO model from a base64 encoded image.
+    Detect emotion using YOLO model from an uploaded image.
+
+    Accepts raw JPEG/PNG bytes (application/octet-stream or image/*), a multipart
+    'image' file, or JSON with a base64 'image'. Options go in the query string,
+    form fields or JSON body respectively.
+    Returns the label and confidence only, unless annotate=true is sent.
     """
     try:
-        # Get the image data from the request
-        data = request.get_json()
-        image_data = data.get('image')
-
-        if not image_data:
+        # Get the image data from the request; binary bodies skip base64 and JSON entirely
+        if request.mimetype == 'application/octet-stream' or request.mimetype.startswith('image/'):
+            image_bytes = request.get_data(cache=False)
+            option_source = request.args
+        elif 'image' in request.files:
+            image_bytes = request.files['image'].read()
+            option_source = request.form
+        else:
+            data = request.get_json(silent=True) or {}
+            image_bytes = None
+            option_source = data
+            image_data = data.get('image')
+
+        try:
+            options = _detection_options(option_source)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': 'No image data provided'
+                'emotion': None,
+                'error': str(e)
             }), 400
 
-        # Detect emotion from the image
-        result = yolo_detector.detect_emotion_from_base64(image_data)
+        yolo_detector = _get_detector()
+        if yolo_detector is None:
+            return jsonify({
+                'success': False,
+                'emotion': None,
+                'error': detector_status()['error'] or DETECTOR_LOADING_ERROR
+            }), 503
+
+        if image_bytes is not None:
+            if not image_bytes:
+                return jsonify({
+                    'success': False,
+                    'error': 'No image data provided'
+                }), 400
+            # Detect emotion from the image; the annotated preview is only rendered on request
+            result = yolo_detector.detect_emotion_from_bytes(
+                image_bytes, cache_scope=session.get('user_id'), **options
+            )
+        else:
+            if not image_data:
+                return jsonify({
+                    'success': False,
+                    'error': 'No image data provided'
+                }), 400
+            result = yolo_detector.detect_emotion_from_base64(
+                image_data, cache_scope=session.get('user_id'), **options
+            )
 
         # Always return the detected emotion in the JSON response for downstream processing
         if result.get('emotion'):
@@ -344,15 +439,65 @@ def detect_emotion():
         current_app.logger.error(error_msg)
         return jsonify({'error': error_msg, 'emotion': None}), 500
 
+@sock.route('/api/emotion-stream', bp=main)
+def emotion_stream(ws):
+    """
+    WebSocket stream for continuous emotion detection.
+
+    Clients send frames as binary JPEG/PNG messages (or base64 text). Frames that
+    arrive while the model is busy replace each other, and the server sends a
+    temporally smoothed {"emotion", "confidence", "agreement", ...} message at a fixed rate.
+    """
+    from .face_roi import FaceTracker
+
+    config = current_app.config
+    yolo_detector = _get_detector()
+    if yolo_detector is None:
+        ws.send(json.dumps({'error': detector_status()['error'] or DETECTOR_LOADING_ERROR}))
+        return
+    # The face ROI and cached results are scoped to this connection's frames
+    tracker = FaceTracker()
+    cache_scope = f"stream:{uuid.uuid4().hex}"
+    stream = EmotionStream(
+        lambda frame: yolo_detector.detect_emotion_from_bytes(
+            frame, cache_scope=cache_scope, annotate=False, tracker=tracker
+        ),
+        half_life=config.get('EMOTION_STREAM_HALF_LIFE', 1.5)
+    )
+    interval = 1.0 / config.get('EMOTION_STREAM_RATE_HZ', 4)
+    next_emit = time.monotonic() + interval
+    try:
+        while True:
+            message = ws.receive(timeout=max(0.0, next_emit - time.monotonic()))
+            if isinstance(message, str):
+                # Accept base64 or data-URL text frames as well
+                try:
+                    message = base64.b64decode(message.split(',', 1)[-1], validate=True)
+                except (binascii.Error, ValueError):
+                    ws.send(json.dumps({'error': 'Text frames must be base64-encoded images'}))
+                    message = None
+            if message:
+                stream.push(message)
+            now = time.monotonic()
+            if now >= next_emit:
+                ws.send(json.dumps(stream.snapshot()))
+                # Don't try to catch up on missed ticks
+                next_emit = max(next_emit + interval, now)
+    finally:
+        stream.close()
+
 #* Suno Music Generation
 @main.route('/api/generate-music', methods=['POST'])
 def generate_music():
     """
-    Generate music using Suno API based on a text prompt.
+    Start a Suno music generation job for a text prompt.
+
+    Returns immediately with a job id; poll /api/generate-music/<job_id> or
+    subscribe to /api/generate-music/<job_id>/events for progress and the audio URL.
     """
     try:
         # Get the prompt from the request
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         prompt = data.get('prompt')
         
         if not prompt:
@@ -363,11 +508,6 @@ def generate_music():
             }), 400
             
         current_app.logger.info(f"Received music generation request with prompt: {prompt}")
-            
-        # Import the suno module
-        from .suno import generate_music, check_status, get_audio_url
-        import os
-        import time
         
         # Get API key from environment
         api_key = os.environ.get('SUNO_API_KEY')
@@ -377,64 +517,78 @@ def generate_music():
                 'success': False,
                 'error': 'SUNO_API_KEY not configured'
             }), 500
-            
-        # Generate music using Suno API
-        current_app.logger.info("Initiating music generation with Suno API")
-        task_data = generate_music(api_key=api_key, prompt=prompt)
-        task_id = task_data.get('taskId') if task_data else None
         
-        if not task_id:
-            current_app.logger.error("Failed to get task ID from Suno API response")
-            return jsonify({
-                'success': False,
-                'error': 'Failed to initiate music generation'
-            }), 500
-            
-        current_app.logger.info(f"Music generation initiated with task ID: {task_id}")
-            
-        # Wait for completion (with a timeout) and send status updates
-        current_app.logger.info("Waiting for music generation to complete")
-        start_time = time.time()
-        max_wait_time = 300  # 5 minutes
-        last_status = None
-        
-        while time.time() - start_time < max_wait_time:
-            try:
-                status = check_status(api_key, task_id)
-                if status and status != last_status:
-                    current_app.logger.info(f"Task status updated: {status}")
-                    last_status = status
-                    
-                if status == "SUCCESS":
-                    current_app.logger.info("Music generation completed successfully")
-                    break
-                elif status == "FAILED":
-                    raise ValueError("Music generation failed")
-                time.sleep(5)  # Wait 5 seconds before checking again
-            except Exception as e:
-                current_app.logger.error(f"Error while waiting for completion: {str(e)}")
-                raise
-        
-        # Get the audio URL
-        current_app.logger.info("Retrieving audio URL")
-        audio_url = get_audio_url(api_key, task_id)
-        
-        if not audio_url:
-            current_app.logger.error("Failed to retrieve audio URL")
-            return jsonify({
-                'success': False,
-                'error': 'Failed to retrieve audio URL'
-            }), 500
-        
-        # Return success response with audio URL
+        # Submission and polling run in the background job manager
+        job = get_music_jobs().submit(
+            api_key, prompt, owner=session.get('user_id'),
+            model=data.get('model') or DEFAULT_MODEL,
+            instrumental=bool(data.get('instrumental', False))
+        )
+        current_app.logger.info(f"Music generation job {job.id} {'served from cache' if job.cached else 'queued'}")
         return jsonify({
             'success': True,
-            'message': 'Music generation completed',
-            'task_id': task_id,
-            'audio_url': audio_url
-        }), 200
+            'message': 'Music generation completed' if job.done else 'Music generation started',
+            'status_url': url_for('main.music_job_status', job_id=job.id),
+            'events_url': url_for('main.music_job_events', job_id=job.id),
+            **_music_job_payload(job)
+        }), 200 if job.done else 202
         
     except Exception as e:
         error_msg = f"Error in generate_music: {str(e)}"
         current_app.logger.error(error_msg)
-        return jsonify({'error': error_msg}), 500
\ No newline at end of file
+        return jsonify({'error': error_msg}), 500
+
+def _get_music_job(job_id):
+    # Jobs are only visible to the session that created them
+    job = get_music_jobs().get(job_id)
+    if job is None or job.owner != session.get('user_id'):
+        return None
+    return job
+
+def _music_job_payload(job):
+    payload = job.to_dict()
+    # Completed audio is played through this server (local copy or redirect to Suno)
+    payload['stream_url'] = url_for('main.suno_audio', task_id=job.task_id) if job.audio_url else None
+    return payload
+
+@main.route('/api/generate-music/<job_id>', methods=['GET'])
+def music_job_status(job_id):
+    job = _get_music_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **_music_job_payload(job)}), 200
+
+@main.route('/api/generate-music/<job_id>/events', methods=['GET'])
+def music_job_events(job_id):
+    """Server-sent events: one 'status' event per job change, ending after the final state."""
+    job = _get_music_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    keepalive = current_app.config.get('SUNO_EVENTS_KEEPALIVE', 15)
+
+    def events():
+        version = -1
+        while True:
+            current = job.wait_for_update(version, timeout=keepalive)
+            if current == version and not job.done:
+                yield ': keepalive\n\n'
+                continue
+            version = current
+            yield f"event: status\ndata: {json.dumps(_music_job_payload(job))}\n\n"
+            if job.done:
+                return
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@main.route('/api/suno-audio/<task_id>', methods=['GET'])
+def suno_audio(task_id):
+    """Serve generated audio from the local cache (with Range/conditional support), else redirect to Suno."""
+    path, audio_url = get_music_jobs().audio_source(task_id)
+    if path:
+        return send_file(path, mimetype='audio/mpeg', conditional=True, max_age=7 * 24 * 3600)
+    if audio_url:
+        return redirect(audio_url)
+    return jsonify({'success': False, 'error': 'Audio not found'}), 404
\ No newline at end of file
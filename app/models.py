@@ -11,6 +11,7 @@ class User(db.Model):
     access_token = db.Column(db.String(255))
     refresh_token = db.Column(db.String(255))
     expires_at = db.Column(db.Integer)
+    last_seen = db.Column(db.Integer, index=True)  # unix time of the last authenticated request
     genres = db.relationship('UserGenre', backref='user', lazy=True)
 
     def __init__(self, user_id, display_name=None):
@@ -30,4 +31,34 @@ class UserGenre(db.Model):
 playlist_songs = db.Table('playlist_songs',
     db.Column('playlist_id', db.Integer, db.ForeignKey('playlist.id'), primary_key=True),
     db.Column('song_id', db.Integer, db.ForeignKey('song.id'), primary_key=True)
-)
\ No newline at end of file
+)
+
+class AudioFeature(db.Model):
+    __tablename__ = 'audio_features'
+    track_id = db.Column(db.String(64), primary_key=True)
+    features = db.Column(db.JSON, nullable=False)
+    fetched_at = db.Column(db.Integer, nullable=False, index=True)
+
+    def __init__(self, track_id, features, fetched_at):
+        self.track_id = track_id
+        self.features = features
+        self.fetched_at = fetched_at
+
+class CatalogTrack(db.Model):
+    __tablename__ = 'catalog_tracks'
+    track_id = db.Column(db.String(64), primary_key=True)
+    genre = db.Column(db.String(100), primary_key=True)
+    title = db.Column(db.String(255))
+    artist = db.Column(db.String(255))
+    album = db.Column(db.String(255))
+    popularity = db.Column(db.Integer)
+    seen_at = db.Column(db.Integer, nullable=False)
+
+    def __init__(self, track_id, genre, title, artist, album, popularity, seen_at):
+        self.track_id = track_id
+        self.genre = genre
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.popularity = popularity
+        self.seen_at = seen_at
@@ -0,0 +1,122 @@
+import numpy as np
+
+# Audio features that contribute to the composite score, in matrix column order
+FEATURE_COLUMNS = (
+    'valence', 'energy', 'danceability', 'tempo',
+    'loudness', 'liveness', 'instrumentalness', 'speechiness'
+)
+
+# Raw ranges used to normalise columns into [0, 1]; unlisted features are already in [0, 1]
+FEATURE_RANGES = {
+    'tempo': (0.0, 250.0),      # BPM
+    'loudness': (-60.0, 0.0),   # dB
+}
+
+# Higher weights for valence (positivity), energy (arousal), danceability, and tempo.
+# Lower weights for ancillary acoustic traits.
+DEFAULT_WEIGHTS = {
+    'valence': 0.35,
+    'energy': 0.20,
+    'danceability': 0.15,
+    'tempo': 0.10,
+    'loudness': 0.08,
+    'liveness': 0.08,
+    'instrumentalness': 0.02,
+    'speechiness': 0.02,
+}
+
+_CALM_WEIGHTS = {
+    'valence': 0.30, 'energy': 0.10, 'danceability': 0.05, 'tempo': 0.10,
+    'loudness': 0.05, 'liveness': 0.05, 'instrumentalness': 0.25, 'speechiness': 0.10,
+}
+_AROUSED_WEIGHTS = {
+    'valence': 0.20, 'energy': 0.30, 'danceability': 0.10, 'tempo': 0.15,
+    'loudness': 0.15, 'liveness': 0.06, 'instrumentalness': 0.02, 'speechiness': 0.02,
+}
+_ANXIOUS_WEIGHTS = {
+    'valence': 0.35, 'energy': 0.25, 'danceability': 0.05, 'tempo': 0.15,
+    'loudness': 0.10, 'liveness': 0.05, 'instrumentalness': 0.03, 'speechiness': 0.02,
+}
+
+# Per-emotion weight profiles; emotions not listed use DEFAULT_WEIGHTS
+EMOTION_WEIGHT_PROFILES = {
+    'Reflection': _CALM_WEIGHTS,
+    'Meditation': _CALM_WEIGHTS,
+    'Patience': _CALM_WEIGHTS,
+    'Modesty': _CALM_WEIGHTS,
+    'Tender feelings': _CALM_WEIGHTS,
+    'High spirits': _AROUSED_WEIGHTS,
+    'Determination': _AROUSED_WEIGHTS,
+    'Anger': _AROUSED_WEIGHTS,
+    'Hatred': _AROUSED_WEIGHTS,
+    'Ill-temper': _AROUSED_WEIGHTS,
+    'Anxiety': _ANXIOUS_WEIGHTS,
+    'Fear': _ANXIOUS_WEIGHTS,
+}
+
+_LOWS = np.array([FEATURE_RANGES.get(c, (0.0, 1.0))[0] for c in FEATURE_COLUMNS])
+_SPANS = np.array([FEATURE_RANGES.get(c, (0.0, 1.0))[1] - FEATURE_RANGES.get(c, (0.0, 1.0))[0] for c in FEATURE_COLUMNS])
+
+
+def weight_vector(emotion=None, profiles=None):
+    """Weight vector (FEATURE_COLUMNS order) for an emotion, with optional profile overrides."""
+    weights = (profiles or {}).get(emotion) or EMOTION_WEIGHT_PROFILES.get(emotion) or DEFAULT_WEIGHTS
+    return np.array([weights.get(c, 0.0) for c in FEATURE_COLUMNS], dtype=np.float64)
+
+
+def feature_matrix(features_list):
+    """
+    Pack feature dicts into an (n, len(FEATURE_COLUMNS)) matrix normalised to [0, 1].
+
+    Missing or non-numeric values become NaN.
+    """
+    matrix = np.full((len(features_list), len(FEATURE_COLUMNS)), np.nan, dtype=np.float64)
+    for row, features in enumerate(features_list):
+        if not features:
+            continue
+        for col, name in enumerate(FEATURE_COLUMNS):
+            value = features.get(name)
+            if isinstance(value, (int, float)):
+                matrix[row, col] = value
+    matrix -= _LOWS
+    matrix /= _SPANS
+    np.clip(matrix, 0.0, 1.0, out=matrix)
+    return matrix
+
+
+def score_features(features_list, emotion=None, profiles=None):
+    """
+    Composite scores for a batch of feature dicts.
+
+    Missing features are imputed with the batch mean for that column (0.5 if
+    no track has it). Tracks with no features at all score 0.
+    """
+    if not features_list:
+        return np.zeros(0)
+    matrix = feature_matrix(features_list)
+    missing = np.isnan(matrix)
+    empty_rows = missing.all(axis=1)
+    if missing.any():
+        present = ~missing
+        counts = present.sum(axis=0)
+        sums = np.where(present, matrix, 0.0).sum(axis=0)
+        column_means = np.divide(sums, counts, out=np.full(matrix.shape[1], 0.5), where=counts > 0)
+        matrix = np.where(missing, column_means, matrix)
+    scores = matrix @ weight_vector(emotion, profiles)
+    scores[empty_rows] = 0.0
+    return scores
+
+
+def top_k_indices(scores, k, descending=True):
+    """Indices of the k best scores, in ranked order, using argpartition."""
+    scores = np.asarray(scores, dtype=np.float64)
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    keys = -scores if descending else scores
+    if k < n:
+        candidates = np.argpartition(keys, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(keys[candidates], kind='stable')]
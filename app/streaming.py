@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class EmotionSmoother:
+    """
+    Temporal smoothing of per-frame emotion labels.
+
+    Each label accumulates confidence (and a detection count) that decays
+    exponentially with the given half-life; the smoothed emotion is the label
+    with the highest score. Once every score has decayed below min_score (no
+    recent detections) the smoother reports no emotion.
+    """
+
+    def __init__(self, half_life=1.5, min_score=0.05):
+        self.half_life = half_life
+        self.min_score = min_score
+        self._scores = {}
+        self._counts = {}
+        self._updated_at = None
+
+    def _decay(self, now):
+        if self._updated_at is not None and self.half_life > 0:
+            factor = 0.5 ** ((now - self._updated_at) / self.half_life)
+            for label in self._scores:
+                self._scores[label] *= factor
+                self._counts[label] *= factor
+        self._updated_at = now
+
+    def update(self, emotion, confidence, now=None):
+        now = time.monotonic() if now is None else now
+        self._decay(now)
+        if emotion:
+            self._scores[emotion] = self._scores.get(emotion, 0.0) + float(confidence or 0.0)
+            self._counts[emotion] = self._counts.get(emotion, 0.0) + 1.0
+
+    def current(self, now=None):
+        """
+        Smoothed (emotion, confidence, agreement) as of now, or (None, 0.0, 0.0) when
+        nothing recent was detected. confidence is the decayed mean model confidence
+        of the leading emotion; agreement is its share of the decayed vote.
+        """
+        self._decay(time.monotonic() if now is None else now)
+        total = sum(self._scores.values())
+        if total < self.min_score:
+            return None, 0.0, 0.0
+        emotion = max(self._scores, key=self._scores.get)
+        return emotion, self._scores[emotion] / self._counts[emotion], self._scores[emotion] / total
+
+
+class EmotionStream:
+    """
+    Per-connection state for continuous emotion detection.
+
+    Incoming frames go into a single-slot buffer; a frame that arrives before
+    the previous one was picked up replaces it, so a slow model never builds
+    a backlog. A background thread runs detect() on the newest frame and feeds
+    the smoother.
+    """
+
+    def __init__(self, detect, half_life=1.5):
+        self.detect = detect
+        self.smoother = EmotionSmoother(half_life)
+        self._cond = threading.Condition()
+        self._latest = None
+        self._closed = False
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self._thread = threading.Thread(target=self._run, name='emotion-stream', daemon=True)
+        self._thread.start()
+
+    def push(self, frame):
+        with self._cond:
+            if self._latest is not None:
+                self.frames_dropped += 1
+            self._latest = frame
+            self.frames_received += 1
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._latest is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                frame, self._latest = self._latest, None
+            try:
+                result = self.detect(frame)
+            except Exception as e:
+                logger.error(f"Error detecting emotion on stream frame: {e}")
+                continue
+            with self._cond:
+                self.smoother.update(result.get('emotion'), result.get('confidence'))
+                self.frames_processed += 1
+
+    def snapshot(self):
+        with self._cond:
+            emotion, confidence, agreement = self.smoother.current()
+            return {
+                'emotion': emotion,
+                'confidence': confidence,
+                'agreement': agreement,
+                'frames_received': self.frames_received,
+                'frames_processed': self.frames_processed,
+                'frames_dropped': self.frames_dropped
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
@@ -2,6 +2,7 @@ import os
 import requests
 import time
 import logging
+from .transport import get_session
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -26,7 +27,7 @@ def generate_music(api_key, prompt, custom_mode=False, instrumental=False, model
     
     try:
         logger.info(f"Sending request to Suno API with prompt: {prompt}")
-        response = requests.post(f"{SUNO_API_BASE_URL}/generate", headers=headers, json=payload)                
+        response = get_session('suno').post(f"{SUNO_API_BASE_URL}/generate", headers=headers, json=payload)                
         response.raise_for_status()
         data = response.json()
         
@@ -55,7 +56,7 @@ def check_status(api_key, task_id):
     
     try:
         logger.info(f"Checking status for task ID: {task_id}")
-        response = requests.get(f"{SUNO_API_BASE_URL}/generate/record-info", headers=headers, params=params)
+        response = get_session('suno').get(f"{SUNO_API_BASE_URL}/generate/record-info", headers=headers, params=params)
         response.raise_for_status()
         task_data = response.json().get("data", [])
         
@@ -81,7 +82,7 @@ def get_music_data(api_key, task_id):
     
     try:
         logger.info(f"Checking status for task ID: {task_id}")
-        response = requests.get(f"{SUNO_API_BASE_URL}/generate/record-info", headers=headers, params=params)
+        response = get_session('suno').get(f"{SUNO_API_BASE_URL}/generate/record-info", headers=headers, params=params)
         response.raise_for_status()
         task_data = response.json().get("data", [])
         
@@ -117,16 +118,23 @@ def wait_for_completion(api_key, task_id, max_wait_time=300):
             raise
     raise TimeoutError("Music generation timed out")
 
+def extract_audio_url(music_data):
+    """
+    Pull the first audio URL out of a record-info payload, or None if it has none yet
+    """
+    if music_data and music_data.get("response") and music_data["response"].get("sunoData"):
+        suno_data = music_data["response"]["sunoData"][0]
+        return suno_data.get("audioUrl")
+    return None
+
 def get_audio_url(api_key, task_id):
     """
     Get the audio URL for the generated music
     """
     try:
         logger.info(f"Getting audio URL for task ID: {task_id}")
-        music_data = get_music_data(api_key, task_id)
-        if music_data and music_data.get("response") and music_data["response"].get("sunoData"):
-            suno_data = music_data["response"]["sunoData"][0]
-            audio_url = suno_data.get("audioUrl")
+        audio_url = extract_audio_url(get_music_data(api_key, task_id))
+        if audio_url:
             logger.info(f"Audio URL retrieved: {audio_url}")
             return audio_url
         logger.warning("No audio URL found in music data")
@@ -140,10 +148,12 @@ def get_status_description(status):
     Get a user-friendly description for a status value
     """
     descriptions = {
+        'QUEUED': 'Submitting your request',
         'PENDING': 'Your request is in the queue',
         'TEXT_SUCCESS': 'Text processing complete. Generating music',
         'FIRST_SUCCESS': 'Last touches...',
         'SUCCESS': 'Music generation completed',
-        'FAILED': 'Music generation failed'
+        'FAILED': 'Music generation failed',
+        'TIMEOUT': 'Music generation timed out'
     }
     return descriptions.get(status, status)
\ No newline at end of file
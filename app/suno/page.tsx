@@ -11,6 +11,7 @@ export default function SunoPage() {
   const [audioUrl, setAudioUrl] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState('');
+  const [statusMessage, setStatusMessage] = useState('');
   const router = useRouter();
   const { isAuthenticated, user } = useAuth();
 
@@ -30,9 +31,12 @@ export default function SunoPage() {
     setIsLoading(true);
     setError('');
     setAudioUrl('');
+    setStatusMessage('');
     
+    const apiBaseUrl = process.env.FLASK_API_BASE_URL || 'http://localhost:8000';
     try {
-      const response = await fetch(`${process.env.FLASK_API_BASE_URL || 'http://localhost:8000'}/api/generate-music`, {
+      // Start the generation job; the server responds right away with a job id
+      const response = await fetch(`${apiBaseUrl}/api/generate-music`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -41,17 +45,36 @@ export default function SunoPage() {
         body: JSON.stringify({ prompt }),
       });
       
-      const data = await response.json();
+      let job = await response.json();
       
       if (!response.ok) {
-        throw new Error(data.error || 'Failed to generate music');
+        throw new Error(job.error || 'Failed to generate music');
       }
       
-      setAudioUrl(data.audio_url);
+      // Poll the job until Suno finishes
+      while (!job.done) {
+        setStatusMessage(job.description || job.status);
+        await new Promise((resolve) => setTimeout(resolve, 3000));
+        const statusResponse = await fetch(`${apiBaseUrl}/api/generate-music/${job.job_id}`, {
+          credentials: 'include',
+        });
+        const statusData = await statusResponse.json();
+        if (!statusResponse.ok) {
+          throw new Error(statusData.error || 'Failed to check music generation status');
+        }
+        job = statusData;
+      }
+      
+      if (job.status !== 'SUCCESS' || !job.audio_url) {
+        throw new Error(job.error || 'Failed to generate music');
+      }
+      // Play through the Flask server, which streams from its local copy when it has one
+      setAudioUrl(job.stream_url ? `${apiBaseUrl}${job.stream_url}` : job.audio_url);
     } catch (err: any) {
       setError(err.message);
     } finally {
       setIsLoading(false);
+      setStatusMessage('');
     }
   };
 
@@ -99,6 +122,10 @@ export default function SunoPage() {
               {isLoading ? 'Generating...' : 'Generate Music'}
             </button>
             
+            {isLoading && statusMessage && (
+              <p className="mt-4 text-fresh-green-700">{statusMessage}</p>
+            )}
+            
             {audioUrl && (
               <div className="mt-6">
                 <h3 className="text-lg font-bold text-fresh-green-800 mb-2">Generated Music:</h3>
@@ -0,0 +1,412 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+from . import suno
+from .cache import cache_get, cache_set
+from .transport import get_session
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('SUCCESS', 'FAILED', 'TIMEOUT')
+# Suno failure statuses, e.g. CREATE_TASK_FAILED, GENERATE_AUDIO_FAILED, SENSITIVE_WORD_ERROR, CALLBACK_EXCEPTION
+FAILURE_MARKERS = ('FAILED', 'ERROR', 'EXCEPTION')
+DEFAULT_MODEL = 'V3_5'
+
+
+def is_failed_status(status):
+    """Whether a Suno record-info status means the generation will never complete."""
+    return bool(status) and any(marker in status for marker in FAILURE_MARKERS)
+
+
+class MusicJob:
+    """One music generation request, tracked from submission to a final audio URL or error."""
+
+    def __init__(self, prompt, owner=None):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.owner = owner
+        self.cached = False
+        self.task_id = None
+        self.status = 'QUEUED'
+        self.audio_url = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # Bumped on every change so event streams can wait for the next update
+        self.version = 0
+        self._cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in TERMINAL_STATUSES
+
+    def update(self, **fields):
+        with self._cond:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait_for_update(self, version, timeout=None):
+        """Block until the job changes past version (or timeout); returns the current version."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > version or self.done, timeout)
+            return self.version
+
+    def to_dict(self):
+        with self._cond:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'description': suno.get_status_description(self.status),
+                'done': self.done,
+                'cached': self.cached,
+                'task_id': self.task_id,
+                'audio_url': self.audio_url,
+                'error': self.error,
+                'created_at': self.created_at,
+                'updated_at': self.updated_at
+            }
+
+
+# Seconds between record-info polls per Suno status: (first interval, cap). The
+# interval grows by POLL_BACKOFF_FACTOR while the status stays the same and
+# resets when it changes, so tasks close to done are checked more often.
+DEFAULT_POLL_BACKOFF = {
+    'PENDING': (5.0, 20.0),
+    'TEXT_SUCCESS': (4.0, 10.0),
+    'FIRST_SUCCESS': (2.0, 5.0)
+}
+POLL_BACKOFF_FACTOR = 1.5
+
+
+def normalize_prompt(prompt):
+    """Case- and whitespace-insensitive key used to coalesce identical prompts."""
+    return ' '.join(prompt.lower().split())
+
+
+def generation_key(prompt, model=DEFAULT_MODEL, instrumental=False):
+    """Identity of a generation request: (normalized prompt, model, instrumental)."""
+    return f"{model}|{int(bool(instrumental))}|{normalize_prompt(prompt)}"
+
+
+class AudioCache:
+    """
+    Local copies of generated audio under one directory, named by Suno task id.
+
+    Files are written to a temporary name and renamed into place, so readers
+    never see a partial download; the oldest files are removed once the
+    directory grows past max_bytes.
+    """
+
+    _TASK_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3, timeout=60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, task_id):
+        if not task_id or not self._TASK_ID.match(task_id):
+            return None
+        return os.path.join(self.directory, f"{task_id}.mp3")
+
+    def get(self, task_id):
+        path = self.path(task_id)
+        return path if path and os.path.exists(path) else None
+
+    def download(self, task_id, audio_url):
+        path = self.path(task_id)
+        if path is None or os.path.exists(path):
+            return path
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with get_session('suno').get(audio_url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(partial, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        self._evict()
+        return path
+
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.mp3'):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+
+class _SunoTask:
+    """One Suno generation; every job submitted with the same prompt while it runs follows it."""
+
+    def __init__(self, key, prompt, api_key, model, instrumental):
+        self.key = key
+        self.prompt = prompt
+        self.api_key = api_key
+        self.model = model
+        self.instrumental = instrumental
+        self.jobs = []
+        self.fields = {}
+        self.status = 'QUEUED'
+        self.started_at = time.monotonic()
+        self.next_poll_at = None
+        self.interval = None
+        self.polling = False
+        self.errors = 0
+
+
+class MusicJobManager:
+    """
+    Runs Suno generations in the background so request threads return immediately.
+
+    Submissions go to a small worker pool; a single poller thread then tracks
+    every outstanding Suno task, polling record-info with per-status backoff.
+    The final record-info payload also supplies the audio URL. A request that
+    matches (normalized prompt, model, instrumental) of a generation still in
+    flight attaches to it, and one that matches a completed generation in the
+    'suno_results' cache finishes immediately. Finished jobs are kept for
+    job_ttl seconds. With an audio_cache, completed audio is also downloaded
+    to local disk on a separate download pool.
+    """
+
+    def __init__(self, max_wait=300.0, max_workers=4, job_ttl=3600.0, poll_backoff=None, max_poll_errors=5,
+                 audio_cache=None, download_workers=2):
+        self.max_wait = max_wait
+        self.job_ttl = job_ttl
+        self.poll_backoff = poll_backoff or DEFAULT_POLL_BACKOFF
+        self.max_poll_errors = max_poll_errors
+        self._jobs = {}
+        self._inflight = {}  # normalized prompt -> _SunoTask
+        self._polling = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='suno-job')
+        self._poller = None
+        self.audio_cache = audio_cache
+        # Downloads are slow and fire-and-forget; keep them off the submit/poll workers
+        self._download_executor = (
+            ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix='suno-audio')
+            if audio_cache is not None else None
+        )
+        self.polls = 0
+        self.coalesced = 0
+        self.result_hits = 0
+
+    def submit(self, api_key, prompt, owner=None, model=DEFAULT_MODEL, instrumental=False):
+        job = MusicJob(prompt, owner)
+        key = generation_key(prompt, model, instrumental)
+        result = cache_get(key, namespace='suno_results')
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            if result is not None:
+                # Same request already generated: reuse the completed task
+                job.update(status='SUCCESS', cached=True, **result)
+                self.result_hits += 1
+                return job
+            task = self._inflight.get(key)
+            if task is not None:
+                # Same prompt already generating: follow that task
+                task.jobs.append(job)
+                job.update(**task.fields)
+                self.coalesced += 1
+                logger.info(f"Music job {job.id} attached to in-flight generation {task.fields.get('task_id')}")
+                return job
+            task = self._inflight[key] = _SunoTask(key, prompt, api_key, model, instrumental)
+            task.jobs.append(job)
+        self._executor.submit(self._start, task)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.updated_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _set(self, task, **fields):
+        """Record task state and mirror it onto every job following the task."""
+        with self._lock:
+            task.fields.update(fields)
+            task.status = task.fields.get('status', task.status)
+            for job in task.jobs:
+                job.update(**fields)
+            if task.status in TERMINAL_STATUSES:
+                if self._inflight.get(task.key) is task:
+                    del self._inflight[task.key]
+                if task in self._polling:
+                    self._polling.remove(task)
+
+    def _start(self, task):
+        try:
+            task_data = suno.generate_music(
+                api_key=task.api_key, prompt=task.prompt, instrumental=task.instrumental, model=task.model
+            )
+            task_id = task_data.get('taskId') if task_data else None
+        except Exception as e:
+            logger.error(f"Failed to start music generation: {e}")
+            self._set(task, status='FAILED', error=str(e))
+            return
+        if not task_id:
+            self._set(task, status='FAILED', error='Failed to initiate music generation')
+            return
+        logger.info(f"Started Suno task {task_id}")
+        self._set(task, task_id=task_id, status='PENDING')
+        with self._wake:
+            self._schedule(task, 'PENDING')
+            self._polling.append(task)
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_loop, name='suno-poller', daemon=True)
+                self._poller.start()
+            self._wake.notify()
+
+    def _schedule(self, task, status, changed=True):
+        # Caller holds self._lock
+        first, cap = self.poll_backoff.get(status) or DEFAULT_POLL_BACKOFF.get(status, DEFAULT_POLL_BACKOFF['PENDING'])
+        task.interval = first if changed or task.interval is None else min(task.interval * POLL_BACKOFF_FACTOR, cap)
+        task.next_poll_at = time.monotonic() + task.interval
+        task.polling = False
+
+    def _poll_loop(self):
+        while True:
+            with self._wake:
+                now = time.monotonic()
+                due = [task for task in self._polling if not task.polling and task.next_poll_at <= now]
+                if not due:
+                    waiting = [task.next_poll_at for task in self._polling if not task.polling]
+                    self._wake.wait(max(0.0, min(waiting) - now) if waiting else None)
+                    continue
+                for task in due:
+                    task.polling = True
+            for task in due:
+                self._executor.submit(self._poll, task)
+
+    def _poll(self, task):
+        """Poll one task; unless it reached a final status, it is always rescheduled or timed out."""
+        task_id = task.fields.get('task_id')
+        changed = False
+        try:
+            try:
+                music_data = suno.get_music_data(task.api_key, task_id)
+                task.errors = 0
+            except Exception as e:
+                task.errors += 1
+                logger.warning(f"Polling Suno task {task_id} failed ({task.errors}/{self.max_poll_errors}): {e}")
+                if task.errors >= self.max_poll_errors:
+                    self._set(task, status='FAILED', error=str(e))
+                    return
+                music_data = None
+            self.polls += 1
+
+            status = music_data.get('status') if music_data else None
+            if status == 'SUCCESS':
+                # The completed record-info payload already carries the audio URL
+                audio_url = suno.extract_audio_url(music_data)
+                if audio_url:
+                    cache_set(task.key, {'task_id': task_id, 'audio_url': audio_url}, namespace='suno_results')
+                    cache_set(task_id, audio_url, namespace='suno_audio')
+                    self._set(task, status='SUCCESS', audio_url=audio_url)
+                    if self._download_executor is not None:
+                        self._download_executor.submit(self._cache_audio, task_id, audio_url)
+                else:
+                    self._set(task, status='FAILED', error='Failed to retrieve audio URL')
+                return
+            if is_failed_status(status):
+                self._set(task, status='FAILED', error=f"Music generation failed ({status})")
+                return
+            changed = bool(status) and status != task.status
+            if changed:
+                self._set(task, status=status)
+        except Exception as e:
+            logger.error(f"Unexpected error polling Suno task {task_id}: {e}")
+        finally:
+            if task.status not in TERMINAL_STATUSES:
+                if time.monotonic() - task.started_at > self.max_wait:
+                    self._set(task, status='TIMEOUT', error='Music generation timed out')
+                else:
+                    with self._wake:
+                        # Errors and empty responses back off on the current status' schedule
+                        self._schedule(task, task.status, changed)
+                        self._wake.notify()
+
+    def _cache_audio(self, task_id, audio_url):
+        try:
+            self.audio_cache.download(task_id, audio_url)
+            logger.info(f"Cached audio for Suno task {task_id}")
+        except Exception as e:
+            logger.warning(f"Failed to cache audio for Suno task {task_id}: {e}")
+
+    def audio_source(self, task_id):
+        """Local audio file for a completed task if cached, else its remote URL (or None if unknown)."""
+        if self.audio_cache is not None:
+            path = self.audio_cache.get(task_id)
+            if path:
+                return path, None
+        return None, cache_get(task_id, namespace='suno_audio')
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            tasks = len(self._inflight)
+        return {
+            'jobs': len(jobs),
+            'active': sum(1 for job in jobs if not job.done),
+            'generations_inflight': tasks,
+            'coalesced': self.coalesced,
+            'result_cache_hits': self.result_hits,
+            'polls': self.polls
+        }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def init_music_jobs(app):
+    """Configure the process-wide music job manager from the Flask app config."""
+    global _manager
+    audio_dir = app.config.get('SUNO_AUDIO_CACHE_DIR')
+    audio_cache = None
+    if audio_dir:
+        audio_cache = AudioCache(
+            os.path.join(app.instance_path, audio_dir),
+            max_bytes=app.config.get('SUNO_AUDIO_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+        )
+    with _manager_lock:
+        _manager = MusicJobManager(
+            max_wait=app.config.get('SUNO_MAX_WAIT', 300),
+            max_workers=app.config.get('SUNO_MAX_WORKERS', 4),
+            job_ttl=app.config.get('SUNO_JOB_TTL', 3600),
+            poll_backoff=app.config.get('SUNO_POLL_BACKOFF'),
+            audio_cache=audio_cache,
+            download_workers=app.config.get('SUNO_AUDIO_DOWNLOAD_WORKERS', 2)
+        )
+    return _manager
+
+def get_music_jobs():
+    """Get the process-wide music job manager, creating a default one if needed."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = MusicJobManager()
+    return _manager
@@ -0,0 +1,287 @@
+from concurrent.futures import Future
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; every process then runs its own refresher
+    fcntl = None
+
+from spotipy.cache_handler import CacheHandler
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
+
+from .extensions import db
+from .models import User
+from .transport import get_session
+
+logger = logging.getLogger(__name__)
+
+# A stored token is used as-is while it has at least this many seconds left
+MIN_TOKEN_VALIDITY = 60
+# last_seen is only written when it is older than this, so requests don't all write the row
+LAST_SEEN_RESOLUTION = 300
+
+
+class _NoTokenCache(CacheHandler):
+    """Tokens live in the users table; spotipy's own cache (a .cache file by default) is not used."""
+
+    def get_cached_token(self):
+        return None
+
+    def save_token_to_cache(self, token_info):
+        pass
+
+
+_oauth = None
+_oauth_lock = threading.Lock()
+
+def get_oauth(config):
+    """Process-wide SpotifyOAuth helper, sharing the pooled 'spotify' session."""
+    global _oauth
+    if _oauth is None:
+        with _oauth_lock:
+            if _oauth is None:
+                _oauth = SpotifyOAuth(
+                    client_id=config['SPOTIFY_CLIENT_ID'],
+                    client_secret=config['SPOTIFY_CLIENT_SECRET'],
+                    redirect_uri=config['SPOTIFY_REDIRECT_URI'],
+                    scope=config['SPOTIFY_SCOPES'],
+                    cache_handler=_NoTokenCache(),
+                    requests_session=get_session('spotify')
+                )
+    return _oauth
+
+def save_tokens(user_id, token_info):
+    """Persist a token response on the user's row (Spotify may omit an unchanged refresh token)."""
+    user = User.query.filter_by(user_id=user_id).first()
+    if user is None:
+        return
+    user.access_token = token_info['access_token']
+    user.refresh_token = token_info.get('refresh_token') or user.refresh_token
+    user.expires_at = int(token_info['expires_at'])
+    user.last_seen = int(time.time())
+    db.session.commit()
+
+def ensure_last_seen_column():
+    """
+    Add users.last_seen to databases created before the column existed; db.create_all()
+    never alters existing tables. Safe to run from several workers at once.
+    """
+    if 'last_seen' in {column['name'] for column in inspect(db.engine).get_columns('users')}:
+        return False
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE users ADD COLUMN last_seen INTEGER'))
+    except (OperationalError, ProgrammingError):
+        # Another worker added it first
+        if 'last_seen' not in {column['name'] for column in inspect(db.engine).get_columns('users')}:
+            raise
+        return False
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_users_last_seen ON users (last_seen)'))
+    except (OperationalError, ProgrammingError) as e:
+        logger.warning(f"Could not index users.last_seen: {e}")
+    logger.info("Added users.last_seen column")
+    return True
+
+def import_session_tokens(user_id, token_info):
+    """
+    Store a token_info dict carried in a pre-server-side session cookie, unless
+    the user's row already holds a token that lasts at least as long.
+    """
+    user = User.query.filter_by(user_id=user_id).first()
+    if user is None or not token_info.get('access_token'):
+        return False
+    if user.refresh_token and (user.expires_at or 0) >= int(token_info.get('expires_at') or 0):
+        return False
+    save_tokens(user_id, token_info)
+    return True
+
+def clear_tokens(user_id):
+    user = User.query.filter_by(user_id=user_id).first()
+    if user is not None:
+        user.access_token = user.refresh_token = user.expires_at = None
+        db.session.commit()
+
+
+# Single-flight refresh: at most one OAuth round-trip per user at a time
+_refreshing = {}
+_refreshing_lock = threading.Lock()
+
+def refresh_user_token(user_id, config):
+    """Refresh a user's token; concurrent callers for the same user share one refresh."""
+    with _refreshing_lock:
+        future = _refreshing.get(user_id)
+        owner = future is None
+        if owner:
+            future = _refreshing[user_id] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        user = User.query.filter_by(user_id=user_id).first()
+        if user is None or not user.refresh_token:
+            raise LookupError(f"No refresh token stored for user {user_id}")
+        token_info = get_oauth(config).refresh_access_token(user.refresh_token)
+        save_tokens(user_id, token_info)
+        future.set_result(token_info['access_token'])
+    except Exception as e:
+        db.session.rollback()
+        # A revoked refresh token will never work again; make the user log in anew
+        if isinstance(e, SpotifyOauthError) and getattr(e, 'error', None) == 'invalid_grant':
+            try:
+                clear_tokens(user_id)
+            except Exception:
+                db.session.rollback()
+        future.set_exception(e)
+    finally:
+        with _refreshing_lock:
+            _refreshing.pop(user_id, None)
+    return future.result()
+
+def get_access_token(user_id, config):
+    """
+    Current access token for a user, or None if they need to log in again.
+
+    The background refresher keeps stored tokens ahead of expiry, so this is
+    normally a single row lookup; only an already-expired token is refreshed
+    on the calling thread.
+    """
+    if not user_id:
+        return None
+    user = User.query.filter_by(user_id=user_id).first()
+    if user is None or not user.access_token:
+        return None
+    now = int(time.time())
+    if now - (user.last_seen or 0) > LAST_SEEN_RESOLUTION:
+        # Marks the user active for the background refresher
+        try:
+            user.last_seen = now
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to record activity for user {user_id}: {e}")
+    if (user.expires_at or 0) - now > MIN_TOKEN_VALIDITY:
+        return user.access_token
+    try:
+        return refresh_user_token(user_id, config)
+    except Exception as e:
+        logger.error(f"Failed to refresh Spotify token for user {user_id}: {e}")
+        return None
+
+
+class TokenRefresher:
+    """
+    Background thread that refreshes the stored tokens of recently active users
+    (seen within active_window seconds) that expire within refresh_ahead seconds.
+
+    With several worker processes on a host, only the one holding an exclusive
+    lock on lock_path refreshes; if it exits, the OS releases the lock and
+    another worker takes over on its next cycle.
+    """
+
+    def __init__(self, app, interval=60, refresh_ahead=1440, active_window=86400, lock_path=None):
+        self.app = app
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.active_window = active_window
+        self.lock_path = lock_path
+        self.refreshed = 0
+        self.failed = 0
+        self._lock_file = None
+        self._counts_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='spotify-token-refresher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _acquire_leadership(self):
+        """True if this process should refresh: it holds (or just took) the host-wide lock."""
+        if self._lock_file is not None or fcntl is None or not self.lock_path:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Token refresher running in process holding {self.lock_path}")
+        return True
+
+    def _count(self, ok):
+        with self._counts_lock:
+            if ok:
+                self.refreshed += 1
+            else:
+                self.failed += 1
+
+    def refresh_due(self):
+        if not self._acquire_leadership():
+            return
+        with self.app.app_context():
+            try:
+                now = int(time.time())
+                query = db.session.query(User.user_id).filter(
+                    User.refresh_token.isnot(None),
+                    User.expires_at < now + self.refresh_ahead
+                )
+                if self.active_window:
+                    # Inactive users are refreshed on demand by get_access_token when they return
+                    query = query.filter(User.last_seen >= now - self.active_window)
+                due = [user_id for (user_id,) in query]
+                for user_id in due:
+                    try:
+                        refresh_user_token(user_id, self.app.config)
+                        self._count(True)
+                    except Exception as e:
+                        self._count(False)
+                        logger.warning(f"Background token refresh failed for user {user_id}: {e}")
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh_due()
+            except Exception as e:
+                logger.error(f"Token refresh cycle failed: {e}")
+
+    def stats(self):
+        with self._counts_lock:
+            return {
+                'refreshed': self.refreshed,
+                'failed': self.failed,
+                'leader': self._lock_file is not None or fcntl is None or not self.lock_path
+            }
+
+
+_refresher = None
+
+def start_token_refresher(app):
+    """Start the background refresher once per process."""
+    global _refresher
+    with _refreshing_lock:
+        if _refresher is not None:
+            return _refresher
+        _refresher = TokenRefresher(
+            app,
+            interval=app.config.get('SPOTIFY_TOKEN_REFRESH_INTERVAL', 60),
+            refresh_ahead=app.config.get('SPOTIFY_TOKEN_REFRESH_AHEAD', 1440),
+            active_window=app.config.get('SPOTIFY_TOKEN_ACTIVE_WINDOW', 86400),
+            lock_path=os.path.join(app.instance_path, 'token_refresher.lock')
+        )
+    _refresher.start()
+    return _refresher
+
+def token_refresher_stats():
+    return _refresher.stats() if _refresher is not None else None
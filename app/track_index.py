@@ -0,0 +1,224 @@
+from flask import current_app
+from .extensions import db
+from .models import AudioFeature, CatalogTrack
+from .feature_store import chunks, upsert_insert
+import numpy as np
+import random
+import threading
+import time
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is pulled in by ultralytics; fall back to brute force without it
+    cKDTree = None
+
+# Feature vector used for nearest-neighbour lookups, in column order
+INDEX_FEATURES = ('valence', 'energy')
+
+# Target (valence, energy) for each emotion in EMOTIONS.md
+EMOTION_TARGETS = {
+    'Joy': (0.90, 0.75),
+    'Love': (0.80, 0.45),
+    'Devotion': (0.70, 0.35),
+    'Tender feelings': (0.70, 0.25),
+    'High spirits': (0.90, 0.90),
+    'Pride': (0.75, 0.70),
+    'Patience': (0.55, 0.25),
+    'Affirmation': (0.75, 0.60),
+    'Surprise': (0.65, 0.80),
+    'Self-attention': (0.55, 0.50),
+    'Modesty': (0.55, 0.30),
+    'Reflection': (0.45, 0.25),
+    'Meditation': (0.50, 0.10),
+    'Determination': (0.60, 0.85),
+    'Suffering': (0.15, 0.35),
+    'Weeping': (0.10, 0.20),
+    'Low spirits': (0.20, 0.25),
+    'Anxiety': (0.25, 0.70),
+    'Fear': (0.20, 0.75),
+    'Grief': (0.10, 0.20),
+    'Dejection': (0.15, 0.20),
+    'Despair': (0.05, 0.30),
+    'Anger': (0.20, 0.90),
+    'Hatred': (0.10, 0.90),
+    'Disdain': (0.25, 0.60),
+    'Contempt': (0.20, 0.60),
+    'Disgust': (0.15, 0.65),
+    'Guilt': (0.20, 0.30),
+    'Helplessness': (0.15, 0.20),
+    'Ill-temper': (0.25, 0.80),
+    'Sulkiness': (0.25, 0.35),
+    'Negation': (0.35, 0.55),
+    'Shyness': (0.45, 0.25),
+    'Blushing': (0.55, 0.35),
+}
+DEFAULT_TARGET = (0.5, 0.5)
+
+
+def feature_vector(features):
+    """Index vector for a feature dict, or None if any component is missing."""
+    values = [features.get(name) for name in INDEX_FEATURES]
+    if any(not isinstance(v, (int, float)) for v in values):
+        return None
+    return np.array(values, dtype=np.float64)
+
+
+def compact_track_data(track_data):
+    """Strip a Spotify track object down to the fields the scoring pipeline reads."""
+    return {
+        'id': track_data.get('id'),
+        'name': track_data.get('name') or '',
+        'artists': [{'name': ((track_data.get('artists') or [{}])[0] or {}).get('name') or ''}],
+        'album': {'name': (track_data.get('album') or {}).get('name') or ''},
+        'popularity': track_data.get('popularity') or 0,
+    }
+
+
+def track_data_from_row(row):
+    """Rebuild the subset of a Spotify track object that the scoring pipeline reads."""
+    return {
+        'id': row.track_id,
+        'name': row.title or '',
+        'artists': [{'name': row.artist or ''}],
+        'album': {'name': row.album or ''},
+        'popularity': row.popularity or 0,
+    }
+
+
+class _GenreIndex:
+    """Tracks seen for one genre; the KD-tree is rebuilt lazily after inserts."""
+
+    def __init__(self):
+        self.tracks = {}  # track_id -> (vector, track_data)
+        self._snapshot = None
+
+    def add(self, track_id, vector, track_data):
+        self.tracks[track_id] = (vector, track_data)
+        self._snapshot = None
+
+    def snapshot(self):
+        if self._snapshot is None:
+            items = list(self.tracks.values())
+            vectors = np.vstack([v for v, _ in items]) if items else np.zeros((0, len(INDEX_FEATURES)))
+            tree = cKDTree(vectors) if cKDTree is not None and items else None
+            self._snapshot = (vectors, [t for _, t in items], tree)
+        return self._snapshot
+
+
+class TrackIndex:
+    """
+    Process-local nearest-neighbour index over tracks we have already seen,
+    keyed by genre and audio-feature vector. Backed by the catalog_tracks table
+    so it survives restarts and is shared (after reload) by every worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._genres = {}
+        self._loaded_at = None
+
+    def _is_fresh(self, now, reload_seconds):
+        return self._loaded_at is not None and (not reload_seconds or now - self._loaded_at < reload_seconds)
+
+    def _ensure_loaded(self, reload_seconds):
+        """Single-flight reload: one thread reads the table while the others keep serving the old index."""
+        now = time.time()
+        with self._lock:
+            if self._is_fresh(now, reload_seconds):
+                return
+            loaded = self._loaded_at is not None
+        # Only the very first load makes callers wait
+        if not self._reload_lock.acquire(blocking=not loaded):
+            return
+        try:
+            with self._lock:
+                if self._is_fresh(now, reload_seconds):
+                    return
+            rows = db.session.query(CatalogTrack, AudioFeature.features).join(
+                AudioFeature, AudioFeature.track_id == CatalogTrack.track_id
+            ).all()
+            genres = {}
+            for track, features in rows:
+                vector = feature_vector(features or {})
+                if vector is not None:
+                    genres.setdefault(track.genre, _GenreIndex()).add(track.track_id, vector, track_data_from_row(track))
+            with self._lock:
+                self._genres = genres
+                self._loaded_at = time.time()
+        finally:
+            self._reload_lock.release()
+
+    def query(self, genre, emotion, k):
+        """
+        Return up to k track dicts near the emotion's target vector for this genre,
+        or None when the genre has too few indexed tracks to answer locally.
+        """
+        config = current_app.config
+        self._ensure_loaded(config.get('TRACK_INDEX_RELOAD_SECONDS', 600))
+        min_tracks = max(config.get('TRACK_INDEX_MIN_TRACKS', 50), k)
+        with self._lock:
+            index = self._genres.get(genre)
+            if index is None or len(index.tracks) < min_tracks:
+                return None
+            vectors, tracks, tree = index.snapshot()
+
+        target = np.array(EMOTION_TARGETS.get(emotion, DEFAULT_TARGET), dtype=np.float64)
+        # Oversample the neighbourhood so users with the same emotion/genre don't all get identical tracks
+        pool_size = min(len(tracks), k * config.get('TRACK_INDEX_OVERSAMPLE', 3))
+        if tree is not None:
+            _, nearest = tree.query(target, k=pool_size)
+            nearest = np.atleast_1d(nearest)
+        else:
+            distances = np.sum((vectors - target) ** 2, axis=1)
+            nearest = np.argpartition(distances, pool_size - 1)[:pool_size]
+        chosen = random.sample(list(nearest), k=min(k, len(nearest)))
+        return [tracks[i] for i in chosen]
+
+    def add_tracks(self, genre, tracks_data, features_dict):
+        """Record freshly fetched tracks (with known features) for a genre."""
+        now = int(time.time())
+        # Playlists can list a track twice; keep one entry per track
+        entries = {}
+        for track_data in tracks_data:
+            track_id = track_data.get('id')
+            vector = feature_vector(features_dict.get(track_id) or {})
+            if track_id and vector is not None:
+                entries[track_id] = (vector, compact_track_data(track_data))
+        if not entries:
+            return 0
+
+        rows = [
+            {
+                'track_id': track_id,
+                'genre': genre,
+                'title': compact['name'],
+                'artist': compact['artists'][0]['name'],
+                'album': compact['album']['name'],
+                'popularity': compact['popularity'],
+                'seen_at': now
+            }
+            for track_id, (_, compact) in entries.items()
+        ]
+        insert = upsert_insert()
+        for chunk in chunks(rows):
+            if insert is None:
+                for row in chunk:
+                    db.session.merge(CatalogTrack(**row))
+                continue
+            # Upsert, so duplicate entries and workers indexing the same genre never hit a duplicate key
+            statement = insert(CatalogTrack).values(chunk)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=[CatalogTrack.track_id, CatalogTrack.genre],
+                set_={'popularity': statement.excluded.popularity, 'seen_at': statement.excluded.seen_at}
+            ))
+        db.session.commit()
+
+        with self._lock:
+            index = self._genres.setdefault(genre, _GenreIndex())
+            for track_id, (vector, compact) in entries.items():
+                index.add(track_id, vector, compact)
+        return len(entries)
+
+
+track_index = TrackIndex()
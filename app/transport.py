@@ -0,0 +1,161 @@
+from http.cookiejar import DefaultCookiePolicy
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Defaults used until init_transport() applies the app config
+DEFAULT_SETTINGS = {
+    'pool_connections': 10,  # hosts kept per session
+    'pool_maxsize': 32,  # keep-alive connections per host
+    'connect_timeout': 3.05,
+    'read_timeout': 10.0,
+    'max_retries': 2,
+    'backoff_factor': 0.3,
+    'max_retry_after': 5.0  # longest Retry-After (seconds) a request thread will sleep for
+}
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_settings = dict(DEFAULT_SETTINGS)
+_sessions = {}
+_sessions_pid = os.getpid()
+_sessions_lock = threading.Lock()
+
+
+class CappedRetry(Retry):
+    """Retry that honours Retry-After but never sleeps longer than the transport's max_retry_after."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, _settings['max_retry_after'])
+
+
+class SharedSession(requests.Session):
+    """
+    Session shared by every caller of one outbound service.
+
+    Requests without an explicit timeout get the transport default. Cookies
+    are never stored, since one user's response must not leak into the next
+    user's request. close() is a no-op because borrowers such as spotipy close
+    their session when they are garbage collected; shutdown() really closes
+    the pools.
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().request(method, url, **kwargs)
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+def init_transport(app):
+    """Configure pool sizes, timeouts and retries from the Flask app config."""
+    with _sessions_lock:
+        _settings.update({
+            'pool_maxsize': app.config.get('HTTP_POOL_MAXSIZE', DEFAULT_SETTINGS['pool_maxsize']),
+            'connect_timeout': app.config.get('HTTP_CONNECT_TIMEOUT', DEFAULT_SETTINGS['connect_timeout']),
+            'read_timeout': app.config.get('HTTP_READ_TIMEOUT', DEFAULT_SETTINGS['read_timeout']),
+            'max_retries': app.config.get('HTTP_MAX_RETRIES', DEFAULT_SETTINGS['max_retries']),
+            'backoff_factor': app.config.get('HTTP_BACKOFF_FACTOR', DEFAULT_SETTINGS['backoff_factor']),
+            'max_retry_after': app.config.get('HTTP_MAX_RETRY_AFTER', DEFAULT_SETTINGS['max_retry_after'])
+        })
+
+def default_timeout():
+    """(connect, read) timeout applied to requests that don't pass one."""
+    return (_settings['connect_timeout'], _settings['read_timeout'])
+
+def _build_session(max_retries, headers):
+    session = SharedSession(default_timeout())
+    if headers:
+        session.headers.update(headers)
+    # Only idempotent methods are retried (urllib3's default allowed_methods), so POSTs are never replayed
+    retry = CappedRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=_settings['backoff_factor'],
+        status_forcelist=RETRY_STATUS_CODES,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=_settings['pool_connections'],
+        pool_maxsize=_settings['pool_maxsize'],
+        max_retries=retry
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session(service, max_retries=None, headers=None):
+    """
+    Shared keep-alive session for an outbound service ('suno', 'reccobeats', 'spotify', ...).
+
+    Each session keeps a connection pool per host. max_retries and headers
+    only apply when the session is first created; pass max_retries=0 for
+    callers that run their own retry loop.
+    """
+    global _sessions_pid
+    session = _sessions.get(service)
+    if session is not None and _sessions_pid == os.getpid():
+        return session
+    with _sessions_lock:
+        # Pools inherited across fork() are shared with the parent; start fresh in the child
+        if _sessions_pid != os.getpid():
+            _sessions.clear()
+            _sessions_pid = os.getpid()
+        session = _sessions.get(service)
+        if session is None:
+            retries = _settings['max_retries'] if max_retries is None else max_retries
+            session = _sessions[service] = _build_session(retries, headers)
+    return session
+
+def _pool_stats(pool):
+    # The queue holds idle connections plus None for slots never opened; checked-out ones are absent
+    queue = pool.pool
+    free = queue.qsize() if queue is not None else 0
+    maxsize = queue.maxsize if queue is not None else 0
+    return {
+        'maxsize': maxsize,
+        'in_use': max(0, maxsize - free),
+        'idle': sum(1 for conn in list(queue.queue) if conn is not None) if queue is not None else 0,
+        'connections_opened': pool.num_connections,
+        'requests': pool.num_requests
+    }
+
+def transport_stats():
+    """Per-service, per-host connection pool occupancy."""
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    stats = {}
+    for service, session in sessions.items():
+        hosts = {}
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    hosts[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = _pool_stats(pool)
+        stats[service] = hosts
+    return stats
+
+def shutdown_transport():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.shutdown()
+        _sessions.clear()
@@ -1,11 +1,21 @@
 from flask import current_app, session
 from .models import UserGenre
+from .extensions import db
 from dataclasses import dataclass
+from collections import OrderedDict
 import spotipy, random, os
+from spotipy.cache_handler import MemoryCacheHandler
+from spotipy.oauth2 import SpotifyClientCredentials
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+import threading
 import time
-from .cache import cache_get, cache_set
+from .cache import cache_get, cache_get_many, cache_get_or_load, cache_set, cache_set_many
+from .feature_store import load_features, save_features
+from .scoring import score_features, top_k_indices
+from .track_index import track_index, compact_track_data
+from .transport import get_session, default_timeout
+from .token_store import get_access_token
 
 random.seed(42)
 ALL_GENRES = []
@@ -35,7 +45,7 @@ def init_app(app):
         with open(genres_path, 'r', encoding='utf-8') as file:
             lines = file.readlines()
             all_genres = [line.strip() for line in lines if line.strip()]
-            cache_set('all_genres', all_genres)
+            cache_set('all_genres', all_genres, namespace='genres')
     except Exception as e:
         current_app.logger.error(f"Error caching genres: {e}")
     
@@ -48,61 +58,203 @@ class TrackDTO:
     title: str
     artist: str
     album: str
-    score: int
+    score: float
     emotion: str
 
+#* Spotify clients, cached per access token
+SPOTIFY_CLIENT_CACHE_SIZE = 256
+_spotify_clients = OrderedDict()
+_spotify_clients_lock = threading.Lock()
+
+class CachedSpotify(spotipy.Spotify):
+    """Spotify client that memoizes the current user's profile for profile_ttl seconds."""
+
+    def __init__(self, *args, profile_ttl=300, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile_ttl = profile_ttl
+        self._profile = None
+        self._profile_at = 0.0
+
+    def me(self):
+        # current_user() delegates here as well
+        if self._profile is None or time.monotonic() - self._profile_at > self.profile_ttl:
+            self._profile = super().me()
+            self._profile_at = time.monotonic()
+        return self._profile
+
 #* Check if the user have access token or not for Spotify Access
 def get_spotify_client(access_token=None):
     if not access_token:
-        if 'token_info' not in session:
-            current_app.logger.error("No token info in session")
+        access_token = get_access_token(session.get('user_id'), current_app.config)
+        if not access_token:
+            current_app.logger.error("No Spotify token stored for the session user")
+            return None
+
+    # One client per token: a refreshed token gets a new client, the old one ages out
+    with _spotify_clients_lock:
+        sp = _spotify_clients.get(access_token)
+        if sp is not None:
+            _spotify_clients.move_to_end(access_token)
+            return sp
+    # Reuse the shared pooled session instead of spotipy opening its own per client
+    sp = CachedSpotify(
+        auth=access_token,
+        requests_session=get_session('spotify'),
+        requests_timeout=default_timeout(),
+        profile_ttl=current_app.config.get('SPOTIFY_PROFILE_TTL', 300)
+    )
+    with _spotify_clients_lock:
+        sp = _spotify_clients.setdefault(access_token, sp)
+        _spotify_clients.move_to_end(access_token)
+        while len(_spotify_clients) > current_app.config.get('SPOTIFY_CLIENT_CACHE_SIZE', SPOTIFY_CLIENT_CACHE_SIZE):
+            _spotify_clients.popitem(last=False)
+    return sp
+
+#* App-level client for catalogue lookups that don't depend on who is asking
+_catalog_client = None
+
+def get_catalog_spotify_client():
+    """Client-credentials Spotify client shared by the process, or None if credentials are missing."""
+    global _catalog_client
+    if _catalog_client is None:
+        config = current_app.config
+        if not config.get('SPOTIFY_CLIENT_ID') or not config.get('SPOTIFY_CLIENT_SECRET'):
             return None
-        access_token = session['token_info']['access_token']
-    return spotipy.Spotify(auth=access_token)
+        with _spotify_clients_lock:
+            if _catalog_client is None:
+                _catalog_client = spotipy.Spotify(
+                    auth_manager=SpotifyClientCredentials(
+                        client_id=config['SPOTIFY_CLIENT_ID'],
+                        client_secret=config['SPOTIFY_CLIENT_SECRET'],
+                        requests_session=get_session('spotify'),
+                        cache_handler=MemoryCacheHandler()
+                    ),
+                    requests_session=get_session('spotify'),
+                    requests_timeout=default_timeout()
+                )
+    return _catalog_client
+
+#* Pooled, concurrent access to the reccobeats audio-features API
+RECCOBEATS_BATCH_SIZE = 50  # API limit
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+_reccobeats_executor = None
+_pool_lock = threading.Lock()
+_jitter = random.Random()  # separate from the seeded module-level RNG used for track selection
+
+class RetryableHTTPError(requests.HTTPError):
+    pass
+
+def _get_reccobeats_session():
+    """Shared keep-alive session; retries are left to _fetch_features_chunk, which knows the deadline."""
+    return get_session('reccobeats', max_retries=0, headers=HEADERS)
+
+def _get_reccobeats_executor(max_workers):
+    """Process-wide executor; its size bounds concurrent reccobeats calls."""
+    global _reccobeats_executor
+    if _reccobeats_executor is None:
+        with _pool_lock:
+            if _reccobeats_executor is None:
+                _reccobeats_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='reccobeats')
+    return _reccobeats_executor
+
+def _backoff_delay(attempt, response=None, base=0.25, cap=4.0):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header."""
+    delay = _jitter.uniform(0, min(cap, base * (2 ** attempt)))
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, float(retry_after))
+    return delay
+
+def _fetch_features_chunk(session, batch_ids, deadline, max_retries):
+    """Fetch one batch of audio features, retrying transient failures until the deadline."""
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Deadline exceeded fetching {len(batch_ids)} audio features")
+        response = None
+        try:
+            response = session.get(URL, params={'ids': ','.join(batch_ids)}, timeout=min(10, remaining))
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                raise RetryableHTTPError(f"{response.status_code} from reccobeats", response=response)
+            response.raise_for_status()
+            music_features = response.json().get('content', [])
+            return music_features if isinstance(music_features, list) else []
+        except (requests.ConnectionError, requests.Timeout, RetryableHTTPError):
+            if attempt >= max_retries:
+                raise
+            delay = _backoff_delay(attempt, response)
+            if time.monotonic() + delay >= deadline:
+                raise
+            time.sleep(delay)
+            attempt += 1
 
 #* Fetch audio features for multiple tracks in batch
 def fetch_audio_features_batch(track_ids):
     # Check cache first
-    uncached_ids = []
-    cached_features = {}
-    
-    for tid in track_ids:
-        cached = cache_get(f"audio_features_{tid}")
-        if cached is not None:
-            cached_features[tid] = cached
-        else:
-            uncached_ids.append(tid)
+    cached_features = cache_get_many(track_ids, namespace='audio_features')
+    uncached_ids = [tid for tid in track_ids if tid not in cached_features]
+
+    # Then the durable feature store, in one bulk lookup
+    if uncached_ids:
+        try:
+            stored_features = load_features(uncached_ids)
+        except Exception as e:
+            current_app.logger.error(f"Error reading audio feature store: {e}")
+            stored_features = {}
+        if stored_features:
+            cache_set_many(stored_features, namespace='audio_features')
+            cached_features.update(stored_features)
+            uncached_ids = [tid for tid in uncached_ids if tid not in stored_features]
     
     if not uncached_ids:
         # All tracks are cached
         return cached_features
     
-    # Fetch uncached tracks in batches
-    batch_size = 50  # API limit
+    # Fetch uncached tracks in batches, concurrently, within one overall deadline
+    config = current_app.config
+    batches = [uncached_ids[i:i+RECCOBEATS_BATCH_SIZE] for i in range(0, len(uncached_ids), RECCOBEATS_BATCH_SIZE)]
+    deadline = time.monotonic() + config.get('RECCOBEATS_DEADLINE', 15)
+    max_retries = config.get('RECCOBEATS_MAX_RETRIES', 3)
+    executor = _get_reccobeats_executor(config.get('RECCOBEATS_MAX_WORKERS', 8))
+    session = _get_reccobeats_session()
     features_dict = {}
+
+    futures = {
+        executor.submit(_fetch_features_chunk, session, batch_ids, deadline, max_retries): batch_ids
+        for batch_ids in batches
+    }
+    try:
+        for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+            batch_ids = futures[future]
+            try:
+                fetched = {
+                    feature['id']: feature for feature in future.result()
+                    if feature and 'id' in feature
+                }
+                features_dict.update(fetched)
+                # Cache the batch in one backend write
+                cache_set_many(fetched, namespace='audio_features')
+            except Exception as e:
+                current_app.logger.error(f"Error fetching audio features for batch: {e}")
+                # Return empty features for failed tracks
+                for track_id in batch_ids:
+                    features_dict.setdefault(track_id, {})
+    except FuturesTimeoutError:
+        current_app.logger.error("Timed out fetching audio features; returning partial results")
+        for future, batch_ids in futures.items():
+            if not future.done():
+                future.cancel()
+                for track_id in batch_ids:
+                    features_dict.setdefault(track_id, {})
     
-    for i in range(0, len(uncached_ids), batch_size):
-        batch_ids = uncached_ids[i:i+batch_size]
-        params = {'ids': ','.join(batch_ids)}
-        
-        try:
-            response = requests.get(URL, headers=HEADERS, params=params, timeout=10)
-            response.raise_for_status()
-            
-            music_features = response.json().get('content', [])
-            if music_features and isinstance(music_features, list):
-                for feature in music_features:
-                    if feature and 'id' in feature:
-                        track_id = feature['id']
-                        features_dict[track_id] = feature
-                        # Cache the result
-                        cache_set(f"audio_features_{track_id}", feature)
-        except Exception as e:
-            current_app.logger.error(f"Error fetching audio features for batch: {e}")
-            # Return empty features for failed tracks
-            for track_id in batch_ids:
-                features_dict[track_id] = {}
-    
+    # Persist newly fetched features so later requests skip the network
+    try:
+        save_features(features_dict)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error writing audio feature store: {e}")
+
     # Combine cached and newly fetched features
     result = cached_features.copy()
     result.update(features_dict)
@@ -110,31 +262,34 @@ def fetch_audio_features_batch(track_ids):
     return result
 
 #* Process tracks in parallel to get audio features
-def process_tracks_parallel(tracks_data, emotion):
+def process_tracks_parallel(tracks_data, emotion, features_dict=None):
     track_objects = []
     
-    # Extract track IDs
-    track_ids = [track_data['id'] for track_data in tracks_data if track_data.get('id')]
+    # Keep only tracks with an ID
+    tracks_data = [track_data for track_data in tracks_data if track_data.get('id')]
+    track_ids = [track_data['id'] for track_data in tracks_data]
     
-    # Fetch audio features in batch
-    features_dict = fetch_audio_features_batch(track_ids)
+    # Fetch audio features in batch, unless the caller already has them
+    if features_dict is None:
+        features_dict = fetch_audio_features_batch(track_ids)
     
-    # Process tracks with their features
-    for track_data in tracks_data:
-        track_id = track_data.get('id')
-        if not track_id:
-            continue
-            
+    # Score every track in one vectorized pass
+    scores = score_features(
+        [features_dict.get(track_id) or {} for track_id in track_ids],
+        emotion,
+        current_app.config.get('EMOTION_WEIGHT_PROFILES')
+    )
+    
+    # Process tracks with their scores
+    for track_data, score in zip(tracks_data, scores):
+        track_id = track_data['id']
         try:
-            features = features_dict.get(track_id, {})
-            score = calculate_composite_score(features) if features else 0
-            
             track_objects.append(TrackDTO(
                 spotify_id=track_id,
                 title=track_data.get('name', ''),
                 artist=track_data.get('artists', [{}])[0].get('name', ''),
                 album=track_data.get('album', {}).get('name', ''),
-                score=score,
+                score=float(score),
                 emotion=emotion
             ))
         except Exception as e:
@@ -143,15 +298,74 @@ def process_tracks_parallel(tracks_data, emotion):
     
     return track_objects
 
+#* Fetch one genre's candidate tracks: playlist search followed by its tracks
+SEARCH_CACHE_FRESH_SECONDS = 3600  # serve older search results stale while refreshing
+_spotify_executor = None
+
+def _get_spotify_executor(max_workers):
+    """Process-wide executor for concurrent Spotify genre lookups."""
+    global _spotify_executor
+    if _spotify_executor is None:
+        with _pool_lock:
+            if _spotify_executor is None:
+                _spotify_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spotify')
+    return _spotify_executor
+
+def _search_genre_playlist(sp, emotion, genre):
+    """Playlist id and compact track list for an emotion/genre search, or None."""
+    # Search for playlists by emotion and genre
+    query = f"{emotion} {genre}"
+    results = sp.search(q=query, type='playlist', limit=5)
+    if not results or not results['playlists']['items']:
+        return None
+    
+    # Fetch tracks from the first playlist
+    playlist_id = results['playlists']['items'][0]['id']
+    total_tracks = sp.playlist_tracks(playlist_id)
+    if not total_tracks or not total_tracks['items']:
+        return None
+    tracks = []
+    for item in total_tracks['items']:
+        track_data = item.get('track') if item else None
+        if track_data and track_data.get('id'):
+            tracks.append(compact_track_data(track_data))
+    return {'playlist_id': playlist_id, 'tracks': tracks}
+
+def _fetch_genre_tracks(sp, emotion, genre, per_genre):
+    """(selected tracks, every track the search returned) for one genre; the full set feeds the track index."""
+    print(f"Currently Processing: {genre}")
+    # Search results are identical for every user, so share them across users. Background
+    # refreshes outlive the request, so sp should be the app-level catalog client, not a user's.
+    search_result = cache_get_or_load(
+        f"{emotion}|{genre}",
+        lambda: _search_genre_playlist(sp, emotion, genre),
+        namespace='genre_search',
+        fresh_for=SEARCH_CACHE_FRESH_SECONDS
+    )
+    if not search_result:
+        return [], []
+    all_tracks = search_result['tracks']
+    if not all_tracks or len(all_tracks) < per_genre:
+        return [], all_tracks or []
+    
+    # Select a subset of tracks for this genre
+    if emotion in POSITIVE_EMOTIONS_DESC:
+        selected = sorted(all_tracks, key=lambda t: t.get('popularity', 0), reverse=False)[:per_genre]
+    elif emotion in NEGATIVE_EMOTIONS_ASC:
+        selected = sorted(all_tracks, key=lambda t: t.get('popularity', 0), reverse=True)[:per_genre]
+    else:
+        selected = random.sample(all_tracks, k=per_genre)
+    return selected, all_tracks
+
 #* Get tracks from Spotify based on the user's selected genres and the emotion
-def get_selected_tracks(emotion, max_count=20):
-    sp = get_spotify_client()
+def get_selected_tracks(emotion, max_count=20, sp=None):
+    sp = sp or get_spotify_client()
     if not sp:
         raise PermissionError(PERMISSION_ERROR)
 
     # Load genres (optimized with caching)
     GENRES_PATH = current_app.config['GENRES_PATH']
-    ALL_GENRES = cache_get('all_genres')
+    ALL_GENRES = cache_get('all_genres', namespace='genres')
     
     if ALL_GENRES is None:
         if not GENRES_PATH or not os.path.exists(GENRES_PATH):
@@ -160,7 +374,7 @@ def get_selected_tracks(emotion, max_count=20):
         with open(GENRES_PATH, 'r', encoding='utf-8') as file:
             lines = file.readlines()
             ALL_GENRES = [line.strip() for line in lines if line.strip()]
-            cache_set('all_genres', ALL_GENRES)
+            cache_set('all_genres', ALL_GENRES, namespace='genres')
     
     # Combine user and random genres
     # Prefer session cache, fall back to DB if not present
@@ -203,55 +417,62 @@ def get_selected_tracks(emotion, max_count=20):
     ['acousticness', 'danceability', 'energy', 'instrumentalness', 'key', 
     'liveness', 'loudness', 'mode', 'speechiness', 'tempo', 'valence']
     """
+    # Answer warm genres from the local track index; only cold genres go to Spotify
+    cold_genres = []
     for genre in combined_genres:
-        print(f"Currently Processing: {genre}")
         try:
-            # Search for playlists by emotion and genre
-            query = f"{emotion} {genre}"
-            results = sp.search(q=query, type='playlist', limit=5)
-            if not results or not results['playlists']['items']:
-                continue
-            
-            # Fetch tracks from the first playlist
-            playlist_id = results['playlists']['items'][0]['id']
-            total_tracks = sp.playlist_tracks(playlist_id)
-            if not total_tracks or not total_tracks['items']:
-                continue
-            all_tracks = total_tracks['items']
-            if len(all_tracks) < per_genre:
-                continue
-            
-            # Select a subset of tracks for this genre
-            if emotion in POSITIVE_EMOTIONS_DESC:
-                selected_tracks = sorted(all_tracks, key=lambda t: t.get('track', {}).get('popularity', 0), reverse=False)[:per_genre]
-            elif emotion in NEGATIVE_EMOTIONS_ASC:
-                selected_tracks = sorted(all_tracks, key=lambda t: t.get('track', {}).get('popularity', 0), reverse=True)[:per_genre]
-            else:
-                selected_tracks = random.sample(all_tracks, k=per_genre)
-            
-            # Extract track data
-            for item in selected_tracks:
-                track_data = item.get('track') if item else None
-                if track_data and track_data.get('id'):
-                    all_tracks_data.append(track_data)
+            indexed_tracks = track_index.query(genre, emotion, per_genre)
         except Exception as e:
-            current_app.logger.error(f"Error fetching tracks for genre '{genre}': {e}")
-            continue
+            current_app.logger.error(f"Error querying track index for genre '{genre}': {e}")
+            indexed_tracks = None
+        if indexed_tracks is None:
+            cold_genres.append(genre)
+        else:
+            all_tracks_data.extend(indexed_tracks)
+
+    # Run every cold genre's search -> playlist_tracks chain concurrently and merge as they finish
+    fetched_by_genre = {}
+    if cold_genres:
+        executor = _get_spotify_executor(current_app.config.get('SPOTIFY_MAX_WORKERS', 8))
+        search_sp = get_catalog_spotify_client() or sp
+        futures = {
+            executor.submit(_fetch_genre_tracks, search_sp, emotion, genre, per_genre): genre
+            for genre in cold_genres
+        }
+        for future in as_completed(futures):
+            genre = futures[future]
+            try:
+                selected, fetched_by_genre[genre] = future.result()
+                all_tracks_data.extend(selected)
+            except Exception as e:
+                current_app.logger.error(f"Error fetching tracks for genre '{genre}': {e}")
+                continue
     
-    # Process all tracks in parallel to get audio features
-    song_objects = process_tracks_parallel(all_tracks_data, emotion)
+    # Fetch audio features once for every candidate and every track we are about to index
+    feature_ids = [track_data['id'] for track_data in all_tracks_data]
+    feature_ids += [track_data['id'] for tracks_data in fetched_by_genre.values() for track_data in tracks_data]
+    features_dict = fetch_audio_features_batch(list(dict.fromkeys(feature_ids)))
+
+    # Grow the local index with what Spotify just returned
+    for genre, tracks_data in fetched_by_genre.items():
+        try:
+            track_index.add_tracks(genre, tracks_data, features_dict)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error indexing tracks for genre '{genre}': {e}")
+
+    # Score all tracks
+    song_objects = process_tracks_parallel(all_tracks_data, emotion, features_dict)
     
     # Sort by score based on emotion
-    if emotion in POSITIVE_EMOTIONS_DESC:
-        song_objects.sort(key=lambda t: t.score, reverse=False)
-    elif emotion in NEGATIVE_EMOTIONS_ASC:
-        song_objects.sort(key=lambda t: t.score, reverse=True)
+    if emotion in POSITIVE_EMOTIONS_DESC or emotion in NEGATIVE_EMOTIONS_ASC:
+        return _top_by_score(song_objects, max_count, descending=emotion in NEGATIVE_EMOTIONS_ASC)
     
     return song_objects[:max_count]
 
 #* Function for creating a Spotify playlist
-def create_spotify_playlist(emotion, tracks):
-    sp = get_spotify_client()
+def create_spotify_playlist(emotion, tracks, sp=None):
+    sp = sp or get_spotify_client()
     if not sp:
         raise PermissionError(PERMISSION_ERROR)
     if not tracks:
@@ -259,8 +480,8 @@ def create_spotify_playlist(emotion, tracks):
         return None
 
     try:
-        profile = sp.me() or {}
-        user_id = profile.get('id')
+        # The user id is stored at login; only ask Spotify if the session lacks it
+        user_id = session.get('user_id') or (sp.me() or {}).get('id')
         if not user_id:
             current_app.logger.error("Failed to retrieve Spotify user ID")
             return None
@@ -285,26 +506,29 @@ def get_embedded_track_code(track_id):
     return f'<iframe src="https://open.spotify.com/embed/track/{track_id}" width="300" height="380" frameborder="0" allowfullscreen="" allowtransparency="true" allow="encrypted-media"></iframe>'
 
 #* Defining each metric's weight in the overall recommendation of the song
-def calculate_composite_score(track):
-    """Composite score emphasizing emotion-defining attributes.
-    Higher weights for valence (positivity), energy (arousal), danceability, and tempo.
-    Lower weights for popularity and ancillary acoustic traits.
-    Note: loudness/tempo are assumed pre-normalized upstream.
+def calculate_composite_score(track, emotion=None):
+    """Composite score for a single track's audio features.
+    See app/scoring.py for the per-emotion weights and column normalization;
+    batches should call score_features directly.
     """
-    return (
-        track['valence'] * 0.35 +
-        track['energy'] * 0.20 +
-        track['danceability'] * 0.15 +
-        track['tempo'] * 0.10 +
-        track['loudness'] * 0.08 +
-        track['liveness'] * 0.08 +
-        track['instrumentalness'] * 0.02 +
-        track['speechiness'] * 0.02
-    )
+    return float(score_features([track], emotion, current_app.config.get('EMOTION_WEIGHT_PROFILES'))[0])
+
+def _top_by_score(tracks, limit, descending):
+    indices = top_k_indices([t.score for t in tracks], limit, descending=descending)
+    return [tracks[i] for i in indices]
+
+#* Pick the top tracks from an already scored list (no Spotify or feature calls)
+def rank_top_tracks(emotion, tracks, limit=5):
+    if emotion in POSITIVE_EMOTIONS_DESC:
+        return _top_by_score(tracks, limit, descending=False)
+    elif emotion in NEGATIVE_EMOTIONS_ASC:
+        return _top_by_score(tracks, limit, descending=True)
+    else:
+        return random.sample(tracks, k=min(limit, len(tracks)))
 
 #* Recommend top 5 tracks
-def get_top_recommended_tracks(emotion, playlist_id, limit=5):
-    sp = get_spotify_client()
+def get_top_recommended_tracks(emotion, playlist_id, limit=5, sp=None):
+    sp = sp or get_spotify_client()
     if not sp:
         raise PermissionError("Spotify client not authenticated")
 
@@ -321,14 +545,7 @@ def get_top_recommended_tracks(emotion, playlist_id, limit=5):
         
         # Process all tracks in parallel
         tracks = process_tracks_parallel(tracks_data, emotion)
-        
-        # Sort and limit based on emotion
-        if emotion in POSITIVE_EMOTIONS_DESC:
-            return sorted(tracks, key=lambda t: t.score, reverse=False)[:limit]
-        elif emotion in NEGATIVE_EMOTIONS_ASC:
-            return sorted(tracks, key=lambda t: t.score, reverse=True)[:limit]
-        else:
-            return random.sample(tracks, k=min(limit, len(tracks)))
+        return rank_top_tracks(emotion, tracks, limit)
         
     except Exception as e:
         current_app.logger.error(f"Error fetching playlist tracks for '{playlist_id}': {e}")
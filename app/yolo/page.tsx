@@ -81,18 +81,18 @@ export default function YOLOPage() {
     // Draw current video frame to canvas
     ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
     
-    // Convert canvas to base64 image
-    const imageData = canvas.toDataURL('image/jpeg', 0.8);
-    const base64Data = imageData.split(',')[1]; // Remove data URL prefix
+    // Encode canvas as JPEG bytes (sent as-is, no base64/JSON wrapping)
+    const imageBlob = await new Promise<Blob | null>((resolve) => canvas.toBlob(resolve, 'image/jpeg', 0.8));
+    if (!imageBlob) return;
     
     try {
       const response = await fetch(`${process.env.FLASK_API_BASE_URL || 'http://localhost:8000'}/api/detect-emotion`, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
+          'Content-Type': 'application/octet-stream',
         },
         credentials: 'include',
-        body: JSON.stringify({ image: base64Data }),
+        body: imageBlob,
       });
       
       const data = await response.json();
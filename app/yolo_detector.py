@@ -1,50 +1,112 @@
 import cv2
+import threading
 import time
 import os
-from ultralytics import YOLO
 import numpy as np
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, List
 import base64
+from .inference import MicroBatcher
+from .face_roi import FaceTracker, crop_face, detect_face
+from .backends import create_backend
+from .frame_cache import FrameResultCache, hash_image_bytes
 
 class YOLOEmotionDetector:
-    def __init__(self, model_path: str = None):  # type: ignore
+    def __init__(self, model_path: str = None, batch_window_ms: float = 0.0, max_batch_size: int = 1,  # type: ignore
+                 annotate: bool = True, preview_max_side: Optional[int] = None, jpeg_quality: int = 95,
+                 face_crop: bool = False, input_size: int = 224, backend: str = 'ultralytics',
+                 intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 result_cache: Optional[FrameResultCache] = None):
         """
         Initialize the YOLO emotion detector.
         
         Args:
             model_path: Path to the YOLO model file. If None, uses the default model.
+            batch_window_ms: How long to wait for concurrent frames before running a batch
+            max_batch_size: Maximum frames per batched inference (1 disables batching)
+            annotate: Default for rendering the annotated image (label-only when False)
+            preview_max_side: Longest side of annotated previews in pixels (None keeps full size)
+            jpeg_quality: JPEG quality of annotated previews
+            face_crop: Crop frames to the detected face before classification
+            input_size: Model input size that face crops are resized to
+            backend: Inference engine, 'ultralytics' or 'onnxruntime'
+            intra_op_threads: onnxruntime intra-op threads (0 lets onnxruntime decide)
+            inter_op_threads: onnxruntime inter-op threads (0 lets onnxruntime decide)
+            result_cache: Perceptual-hash cache reused for near-duplicate encoded frames (may be shared)
         """
+        self.face_crop = face_crop
+        self.input_size = input_size
+        self.annotate = annotate
+        self.preview_max_side = preview_max_side
+        self.jpeg_quality = jpeg_quality
+        self.result_cache = result_cache
         if model_path is None:
             model_path = os.path.join(os.path.dirname(__file__), "best.onnx")
         
-        self.model = YOLO(model_path, task='classify')
+        self.backend = create_backend(
+            backend, model_path,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            max_batch_size=max_batch_size,
+            input_size=input_size
+        )
         self.supported_emotions = ['Angry', 'Fearful', 'Happy', 'Neutral', 'Sad']
+        self._buffers = threading.local()
+        self.batcher = MicroBatcher(self.predict, batch_window_ms, max_batch_size) if max_batch_size > 1 else None
     
-    def detect_emotion_from_frame(self, frame: np.ndarray) -> Dict:
+    def preprocess(self, frame: np.ndarray, tracker: Optional[FaceTracker] = None) -> np.ndarray:
         """
-        Detect emotion from a single frame and return annotated image.
+        Convert a frame (BGR or already grayscale) to the 3-channel grayscale image the model expects.
         
-        Args:
-            frame: Input image frame (BGR format)
-            
-        Returns:
-            Dictionary with detected emotion, confidence, and annotated image
+        When face cropping is enabled, the face ROI (tracked across frames if a tracker
+        is given) is cropped and resized to the model input size; frames without a
+        detectable face are passed through whole.
+        
+        The 3-channel image is written into a per-thread buffer that is reused while the
+        frame size stays the same, so it is only valid until this thread's next call.
         """
         # Convert the frame to grayscale
-        gray_image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Convert grayscale to 3-channel image
-        gray_image_3d = cv2.merge([gray_image, gray_image, gray_image])
+        gray_image = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
-        # Perform inference
-        results = self.model(gray_image_3d)
-        result = results[0]
+        # Crop to the face so the classifier doesn't spend work on background pixels
+        if self.face_crop:
+            box = tracker.locate(gray_image) if tracker is not None else detect_face(gray_image)
+            if box is not None:
+                gray_image = crop_face(gray_image, box, self.input_size)
         
-        # Extract detected emotion label if available
+        # Replicate grayscale into a reusable 3-channel buffer
+        buffer = getattr(self._buffers, 'gray_3d', None)
+        if buffer is None or buffer.shape[:2] != gray_image.shape[:2]:
+            buffer = self._buffers.gray_3d = np.empty((*gray_image.shape[:2], 3), dtype=np.uint8)
+        return cv2.cvtColor(gray_image, cv2.COLOR_GRAY2BGR, dst=buffer)
+    
+    @staticmethod
+    def decode_image(image_bytes) -> np.ndarray:
+        """Decode JPEG/PNG bytes straight to a single-channel grayscale frame."""
+        frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if frame is None:
+            raise ValueError('Could not decode image data')
+        return frame
+    
+    def predict(self, images: List[np.ndarray]) -> List:
+        """Run inference on a list of preprocessed images with the configured backend."""
+        return self.backend.predict(images)
+    
+    def warmup(self, size: int = 64) -> None:
+        """Run one dummy inference so the first real request doesn't pay for session setup."""
+        self.predict([np.zeros((size, size, 3), dtype=np.uint8)])
+    
+    def _infer(self, image: np.ndarray):
+        if self.batcher is not None:
+            return self.batcher.submit(image).result()
+        return self.predict([image])[0]
+    
+    @staticmethod
+    def _parse_result(result) -> Tuple[Optional[str], float]:
+        """Extract the detected emotion label and confidence from a YOLO result."""
         detected_emotion = None
         confidence = 0.0
         
-        if hasattr(result, 'names') and hasattr(result, 'probs') and hasattr(result, 'boxes'):
+        if hasattr(result, 'names') and hasattr(result, 'probs') and getattr(result, 'boxes', None) is not None:
             # If YOLO result has class indices and probabilities
             if len(result.boxes) > 0:
                 class_idx = int(result.boxes.cls[0])
@@ -55,6 +117,21 @@ class YOLOEmotionDetector:
             class_idx = int(result.probs.top1)
             detected_emotion = result.names[class_idx]
             confidence = float(result.probs.top1conf)
+        return detected_emotion, confidence
+    
+    def render_annotation(self, result, frame: np.ndarray, preview_max_side: Optional[int] = None,
+                          jpeg_quality: Optional[int] = None) -> str:
+        """
+        Render the result onto the frame and return it as a base64 JPEG preview.
+        
+        Args:
+            result: YOLO result for the frame
+            frame: Frame the result was computed on
+            preview_max_side: Longest side of the preview in pixels (None keeps full size)
+            jpeg_quality: JPEG quality (0-100)
+        """
+        preview_max_side = self.preview_max_side if preview_max_side is None else preview_max_side
+        jpeg_quality = self.jpeg_quality if jpeg_quality is None else jpeg_quality
         
         # Plot results on the frame
         try:
@@ -63,9 +140,40 @@ class YOLOEmotionDetector:
             print("Error: plot() method not available for results.")
             annotated_frame = frame.copy()
         
+        # Downscale before encoding; encode cost grows with pixel count
+        height, width = annotated_frame.shape[:2]
+        if preview_max_side and max(height, width) > preview_max_side:
+            scale = preview_max_side / max(height, width)
+            annotated_frame = cv2.resize(annotated_frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        
         # Convert annotated frame to base64 for sending to frontend
-        _, buffer = cv2.imencode('.jpg', annotated_frame)
-        annotated_image_base64 = base64.b64encode(buffer).decode('utf-8')  # type: ignore
+        _, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+        return base64.b64encode(buffer).decode('utf-8')  # type: ignore
+    
+    def detect_emotion_from_frame(self, frame: np.ndarray, annotate: Optional[bool] = None,
+                                  preview_max_side: Optional[int] = None, jpeg_quality: Optional[int] = None,
+                                  tracker: Optional[FaceTracker] = None) -> Dict:
+        """
+        Detect emotion from a single frame, optionally returning an annotated preview.
+        
+        Args:
+            frame: Input image frame (BGR format)
+            annotate: Whether to render and encode the annotated image (defaults to the detector setting)
+            preview_max_side: Longest side of the annotated preview in pixels
+            jpeg_quality: JPEG quality of the annotated preview
+            tracker: Face tracker carrying the ROI across frames of one stream
+            
+        Returns:
+            Dictionary with detected emotion, confidence, and annotated image (None unless annotated)
+        """
+        # Perform inference (batched with concurrent callers when enabled)
+        result = self._infer(self.preprocess(frame, tracker))
+        
+        # Extract detected emotion label if available
+        detected_emotion, confidence = self._parse_result(result)
+        
+        annotate = self.annotate if annotate is None else annotate
+        annotated_image_base64 = self.render_annotation(result, frame, preview_max_side, jpeg_quality) if annotate else None
         
         return {
             'emotion': detected_emotion,
@@ -73,12 +181,54 @@ class YOLOEmotionDetector:
             'annotated_image': annotated_image_base64
         }
     
-    def detect_emotion_from_base64(self, image_data: str) -> Dict:
+    def detect_emotion_from_bytes(self, image_bytes, cache_scope=None, **options) -> Dict:
+        """
+        Detect emotion from raw JPEG/PNG bytes.
+        
+        Args:
+            image_bytes: Encoded image bytes (bytes, bytearray or memoryview)
+            cache_scope: Client the frame came from (stream or user); results are only
+                reused within one scope, and not cached at all without one
+            **options: Annotation options passed to detect_emotion_from_frame
+            
+        Returns:
+            Dictionary with detected emotion, confidence, and annotated image
+        """
+        try:
+            # Near-duplicate frames reuse a recent verdict; annotated previews are always rendered fresh
+            annotate = options.get('annotate')
+            frame_hash = None
+            if (self.result_cache is not None and cache_scope is not None
+                    and not (self.annotate if annotate is None else annotate)):
+                frame_hash = hash_image_bytes(image_bytes)
+                cached = self.result_cache.get(cache_scope, frame_hash) if frame_hash is not None else None
+                if cached is not None:
+                    return cached
+            
+            # Decode directly to grayscale; the model only sees gray pixels anyway
+            frame = self.decode_image(image_bytes)
+            
+            # Detect emotion from frame
+            result = self.detect_emotion_from_frame(frame, **options)
+            if frame_hash is not None:
+                self.result_cache.set(cache_scope, frame_hash, result)
+            return result
+        except Exception as e:
+            print(f"Error processing image: {e}")
+            return {
+                'emotion': None,
+                'confidence': 0.0,
+                'annotated_image': None,
+                'error': str(e)
+            }
+    
+    def detect_emotion_from_base64(self, image_data: str, **options) -> Dict:
         """
         Detect emotion from a base64 encoded image.
         
         Args:
             image_data: Base64 encoded image data
+            **options: Annotation options passed to detect_emotion_from_frame
             
         Returns:
             Dictionary with detected emotion, confidence, and annotated image
@@ -89,12 +239,7 @@ class YOLOEmotionDetector:
                 image_data = image_data.split(',')[1]
             
             # Decode base64 image
-            image_data = base64.b64decode(image_data)  # type: ignore
-            image_array = np.frombuffer(image_data, np.uint8)  # type: ignore
-            frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            
-            # Detect emotion from frame
-            return self.detect_emotion_from_frame(frame)
+            image_bytes = base64.b64decode(image_data)
         except Exception as e:
             print(f"Error processing image: {e}")
             return {
@@ -103,20 +248,36 @@ class YOLOEmotionDetector:
                 'annotated_image': None,
                 'error': str(e)
             }
+        return self.detect_emotion_from_bytes(image_bytes, **options)
+    
+    @staticmethod
+    def _thumbnail(frame: np.ndarray, size: Tuple[int, int] = (64, 48)) -> np.ndarray:
+        """Tiny grayscale copy of a frame, used to measure scene change between samples."""
+        gray_image = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray_image, size, interpolation=cv2.INTER_AREA)
     
-    def detect_emotion_from_camera(self, duration: float = 5.0) -> Dict:
+    def detect_emotion_from_camera(self, duration: float = 5.0, inference_budget: float = 0.5,
+                                   change_threshold: float = 3.0, min_samples: int = 3,
+                                   stable_share: float = 0.8, stable_samples: int = 4) -> Dict:
         """
-        Detect emotion from camera feed for a specified duration.
+        Detect emotion from camera feed with adaptive frame sampling.
+        
+        Frames are sampled at a rate that keeps inference within the given share of
+        wall time, frames nearly identical to the last sampled one are skipped, and the
+        verdict is a confidence-weighted vote that stops early once it is stable.
         
         Args:
-            duration: Duration in seconds to capture frames (minimum 5 seconds)
+            duration: Maximum duration in seconds to capture frames; capture may end sooner once the vote is stable
+            inference_budget: Fraction of wall time to spend on inference (0-1]
+            change_threshold: Mean absolute pixel difference below which a frame counts as unchanged
+            min_samples: Samples required before the vote may terminate early (skipped
+                unchanged frames count as repeats of the last sample)
+            stable_share: Vote share the leading emotion needs to be considered stable
+            stable_samples: Consecutive samples (including skipped repeats) the leader must hold that share for
             
         Returns:
-            Dictionary with detected emotion, confidence, and annotated image
+            Dictionary with detected emotion, confidence, annotated image and sampling stats
         """
-        # Ensure minimum duration of 5 seconds
-        duration = max(duration, 5.0)
-        
         cap = cv2.VideoCapture(0)
         
         if not cap.isOpened():
@@ -129,11 +290,14 @@ class YOLOEmotionDetector:
             }
             
         start_time = time.time()
-        result = {
-            'emotion': None,
-            'confidence': 0.0,
-            'annotated_image': None
-        }
+        tracker = FaceTracker()
+        votes: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        # observations counts sampled frames plus skipped repeats of them, for the stability check
+        samples = skipped = observations = stable_run = 0
+        next_sample_at = start_time
+        last_thumbnail = None
+        last_sample = None
         
         try:
             while True:
@@ -142,15 +306,62 @@ class YOLOEmotionDetector:
                     print("Failed to grab frame.")
                     break
                 
-                # Detect emotion from frame
-                result = self.detect_emotion_from_frame(frame)
+                now = time.time()
+                if now - start_time > duration or cv2.waitKey(1) == 27:
+                    break
+                if now < next_sample_at:
+                    continue
+                
+                # Skip frames that barely differ from the last sampled one
+                thumbnail = self._thumbnail(frame)
+                if last_thumbnail is not None and cv2.absdiff(thumbnail, last_thumbnail).mean() < change_threshold:
+                    skipped += 1
+                    next_sample_at = now + 0.05
+                    # An unchanged frame repeats the last verdict, so a still subject can still settle the vote
+                    observations += 1
+                    stable_run = stable_run + 1 if stable_run else 0
+                    if observations >= min_samples and stable_run >= stable_samples:
+                        break
+                    continue
+                last_thumbnail = thumbnail
                 
-                # Exit after specified duration or if ESC is pressed
-                if (time.time() - start_time) > duration or cv2.waitKey(1) == 27:
+                # Detect emotion from frame and pace the next sample to the inference budget
+                infer_start = time.time()
+                result = self._infer(self.preprocess(frame, tracker))
+                infer_time = time.time() - infer_start
+                next_sample_at = time.time() + infer_time * (1.0 / max(inference_budget, 1e-3) - 1.0)
+                
+                emotion, confidence = self._parse_result(result)
+                last_sample = (result, frame)
+                samples += 1
+                observations += 1
+                if emotion:
+                    votes[emotion] = votes.get(emotion, 0.0) + confidence
+                    counts[emotion] = counts.get(emotion, 0) + 1
+                
+                # Stop early once one emotion clearly and consistently leads the vote
+                total = sum(votes.values())
+                leader_share = max(votes.values()) / total if total else 0.0
+                stable_run = stable_run + 1 if leader_share >= stable_share else 0
+                if observations >= min_samples and stable_run >= stable_samples:
                     break
                     
         finally:
             cap.release()
             cv2.destroyAllWindows()
-            
-        return result
\ No newline at end of file
+        
+        result = {
+            'emotion': None,
+            'confidence': 0.0,
+            'annotated_image': None,
+            'samples': samples,
+            'skipped': skipped
+        }
+        if votes:
+            emotion = max(votes, key=votes.get)  # type: ignore
+            result['emotion'] = emotion
+            result['confidence'] = votes[emotion] / counts[emotion]
+            result['agreement'] = votes[emotion] / sum(votes.values())
+        if last_sample is not None and self.annotate:
+            result['annotated_image'] = self.render_annotation(*last_sample)
+        return result
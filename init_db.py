@@ -12,7 +12,7 @@ from app import create_app
 from app.extensions import db
 
 def init_db():
-    app = create_app('development')
+    app = create_app('development', preload_models=False)
     
     with app.app_context():
         # Create all tables
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Script to export or pre-seed the local audio-features store.
+
+Usage:
+    python manage_features.py export features.jsonl
+    python manage_features.py import features.jsonl
+"""
+import argparse
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.feature_store import export_features, import_features
+
+def main():
+    parser = argparse.ArgumentParser(description='Export or import stored audio features (JSON lines).')
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('path')
+    parser.add_argument('--config', default='development')
+    args = parser.parse_args()
+
+    app = create_app(args.config, preload_models=False)
+    with app.app_context():
+        if args.action == 'export':
+            count = export_features(args.path)
+            print(f"Exported {count} tracks to {args.path}")
+        else:
+            count = import_features(args.path)
+            print(f"Imported {count} tracks from {args.path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Script to build and compare the emotion model variants registered in
+app/backends.py (MODEL_VARIANTS).
+
+Usage:
+    python manage_models.py export fp32-160 --weights best.pt
+    python manage_models.py quantize int8
+    python manage_models.py benchmark path/to/images --variants fp32 int8 fp32-160 int8-160
+
+The benchmark runs every variant through onnxruntime on the same images and
+reports latency alongside top-1 agreement with the reference variant.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+
+from app.backends import MODEL_VARIANTS, variant_path, resolve_model_variant
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def export_variant(name, weights, force=False):
+    """Export FP32 ONNX at the variant's input size from the original .pt weights."""
+    # fp32 is the shipped reference model the benchmark compares against; never replace it by accident
+    if os.path.exists(variant_path(name)) and not force:
+        sys.exit(f"{variant_path(name)} already exists; pass --force to overwrite it")
+    from ultralytics import YOLO
+
+    export_size = MODEL_VARIANTS[name]['export_size']
+    exported = YOLO(weights).export(format='onnx', imgsz=export_size)
+    shutil.move(exported, variant_path(name))
+    print(f"Exported {weights} at {export_size}px to {variant_path(name)}")
+
+def quantize_variant(name):
+    """Dynamic INT8 quantization of the variant's FP32 source model."""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = MODEL_VARIANTS[name].get('source')
+    if source is None:
+        sys.exit(f"Variant '{name}' is not a quantized variant")
+    source_path, _ = resolve_model_variant(source)
+    output_path = variant_path(name)
+    quantize_dynamic(source_path, output_path, weight_type=QuantType.QUInt8)
+
+    # Keep the class names and image size ultralytics stores in the model metadata
+    original, quantized = onnx.load(source_path), onnx.load(output_path)
+    existing = {prop.key for prop in quantized.metadata_props}
+    for prop in original.metadata_props:
+        if prop.key not in existing:
+            quantized.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(quantized, output_path)
+
+    size_mb = lambda path: os.path.getsize(path) / 1e6
+    print(f"Quantized {source_path} ({size_mb(source_path):.1f} MB) to {output_path} ({size_mb(output_path):.1f} MB)")
+
+def load_images(directory, limit):
+    paths = sorted(
+        os.path.join(root, filename)
+        for root, _, filenames in os.walk(directory)
+        for filename in filenames
+        if filename.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    images = []
+    for path in paths[:limit]:
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is not None:
+            images.append(image)
+    return images
+
+def run_variant(name, images, face_crop, threads, repeats):
+    """Top-1 labels and per-image latencies (ms) for one variant, preprocessed as in the app."""
+    from app.yolo_detector import YOLOEmotionDetector
+
+    model_path, input_size = resolve_model_variant(name)
+    detector = YOLOEmotionDetector(
+        model_path, annotate=False, face_crop=face_crop, input_size=input_size,
+        backend='onnxruntime', intra_op_threads=threads, inter_op_threads=1
+    )
+    detector.warmup()
+    inputs = [detector.preprocess(image).copy() for image in images]
+
+    labels, latencies = [], []
+    for image in inputs:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            result = detector.backend.predict([image])[0]
+            latencies.append((time.perf_counter() - started) * 1000.0)
+        labels.append(result.names[result.probs.top1])
+    return labels, np.array(latencies)
+
+def benchmark(directory, variants, reference, face_crop, threads, repeats, limit):
+    images = load_images(directory, limit)
+    if not images:
+        sys.exit(f"No images found in {directory}")
+    print(f"Benchmarking {len(variants)} variants on {len(images)} images ({threads} threads)")
+
+    if reference not in variants:
+        variants = [reference] + variants
+    results = {name: run_variant(name, images, face_crop, threads, repeats) for name in variants}
+    reference_labels = results[reference][0]
+
+    print(f"{'variant':<10} {'size MB':>8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'agree':>7}")
+    for name in variants:
+        labels, latencies = results[name]
+        agreement = sum(a == b for a, b in zip(labels, reference_labels)) / len(labels)
+        print(
+            f"{name:<10} {os.path.getsize(variant_path(name)) / 1e6:>8.1f} {latencies.mean():>8.2f} "
+            f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f} {agreement:>7.1%}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and compare emotion model variants.')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    export_parser = subparsers.add_parser('export', help='export a reduced-resolution FP32 variant')
+    export_parser.add_argument('variant', choices=sorted(n for n, v in MODEL_VARIANTS.items() if 'export_size' in v))
+    export_parser.add_argument('--weights', required=True, help='original ultralytics .pt weights')
+    export_parser.add_argument('--force', action='store_true', help='overwrite an existing model file')
+
+    quantize_parser = subparsers.add_parser('quantize', help='build a dynamic INT8 variant')
+    quantize_parser.add_argument('variant', choices=sorted(n for n, v in MODEL_VARIANTS.items() if 'source' in v))
+
+    benchmark_parser = subparsers.add_parser('benchmark', help='latency vs top-1 agreement on an image directory')
+    benchmark_parser.add_argument('images')
+    benchmark_parser.add_argument('--variants', nargs='+', choices=sorted(MODEL_VARIANTS), default=['fp32', 'int8'])
+    benchmark_parser.add_argument('--reference', choices=sorted(MODEL_VARIANTS), default='fp32')
+    benchmark_parser.add_argument('--face-crop', action='store_true', help='crop to the detected face first (YOLO_FACE_CROP)')
+    benchmark_parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    benchmark_parser.add_argument('--repeats', type=int, default=3)
+    benchmark_parser.add_argument('--limit', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.action == 'export':
+        export_variant(args.variant, args.weights, args.force)
+    elif args.action == 'quantize':
+        quantize_variant(args.variant)
+    else:
+        benchmark(args.images, args.variants, args.reference, args.face_crop,
+                  args.threads, args.repeats, args.limit)
+
+if __name__ == '__main__':
+    main()